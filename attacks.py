@@ -0,0 +1,105 @@
+#attack and ray tables, computed once at import and indexed by square (see bitboard.py)
+from bitboard import lsb, msb
+
+#(rank, file) steps
+KNIGHT_STEPS = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+KING_STEPS = ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1))
+
+#ray directions, the first four run towards higher square indices
+NORTH, NORTHEAST, EAST, NORTHWEST, SOUTH, SOUTHWEST, WEST, SOUTHEAST = range(8)
+DIRECTIONS = ((1, 0), (1, 1), (0, 1), (1, -1), (-1, 0), (-1, -1), (0, -1), (-1, 1))
+
+def stepMask(sq, steps):
+    i, j = sq >> 3, sq & 7
+    mask = 0
+    for x, y in steps:
+        if 0 <= i + x < 8 and 0 <= j + y < 8:
+            mask |= 1 << (8 * (i + x) + j + y)
+    return mask
+
+def rayMask(sq, direction):
+    x, y = DIRECTIONS[direction]
+    i, j = (sq >> 3) + x, (sq & 7) + y
+    mask = 0
+    while 0 <= i < 8 and 0 <= j < 8:
+        mask |= 1 << (8 * i + j)
+        i, j = i + x, j + y
+    return mask
+
+KNIGHT_ATTACKS = tuple(stepMask(sq, KNIGHT_STEPS) for sq in range(64))
+KING_ATTACKS = tuple(stepMask(sq, KING_STEPS) for sq in range(64))
+
+#squares attacked by a pawn of the given color standing on sq
+PAWN_ATTACKS = {
+    'w': tuple(stepMask(sq, ((1, -1), (1, 1))) for sq in range(64)),
+    'b': tuple(stepMask(sq, ((-1, -1), (-1, 1))) for sq in range(64)),
+}
+
+#single and (from the initial rank) double pawn advances on an empty board
+PAWN_PUSHES = {
+    'w': tuple(stepMask(sq, ((1, 0), (2, 0)) if sq >> 3 == 1 else ((1, 0),)) for sq in range(64)),
+    'b': tuple(stepMask(sq, ((-1, 0), (-2, 0)) if sq >> 3 == 6 else ((-1, 0),)) for sq in range(64)),
+}
+
+#king targets of castles, only from the king's initial square
+CASTLE_TARGETS = {
+    'w': tuple((1 << 2 | 1 << 6) if sq == 4 else 0 for sq in range(64)),
+    'b': tuple((1 << 58 | 1 << 62) if sq == 60 else 0 for sq in range(64)),
+}
+
+#RAYS[direction][sq] are the squares from sq (exclusive) to the edge of the board
+RAYS = tuple(tuple(rayMask(sq, direction) for sq in range(64)) for direction in range(8))
+
+#empty-board reach of the sliding pieces
+ROOK_LINES = tuple(RAYS[NORTH][sq] | RAYS[EAST][sq] | RAYS[SOUTH][sq] | RAYS[WEST][sq] for sq in range(64))
+BISHOP_LINES = tuple(RAYS[NORTHEAST][sq] | RAYS[NORTHWEST][sq] | RAYS[SOUTHWEST][sq] | RAYS[SOUTHEAST][sq] for sq in range(64))
+QUEEN_LINES = tuple(ROOK_LINES[sq] | BISHOP_LINES[sq] for sq in range(64))
+
+def betweenMask(sq, newsq):
+    for direction in range(8):
+        if RAYS[direction][sq] >> newsq & 1:
+            return RAYS[direction][sq] & ~RAYS[direction][newsq] & ~(1 << newsq)
+    return 0
+
+#BETWEEN[sq][newsq] are the squares strictly between two squares on a common line, empty otherwise
+BETWEEN = tuple(tuple(betweenMask(sq, newsq) for newsq in range(64)) for sq in range(64))
+
+def rayAttacks(sq, occupied, direction):
+    """Squares attacked along one ray, up to and including the first occupied square."""
+    ray = RAYS[direction][sq]
+    blockers = ray & occupied
+    if not blockers:
+        return ray
+
+    blocker = lsb(blockers) if direction < 4 else msb(blockers)
+    return ray ^ RAYS[direction][blocker]
+
+def rookAttacks(sq, occupied):
+    return (rayAttacks(sq, occupied, NORTH) | rayAttacks(sq, occupied, EAST)
+            | rayAttacks(sq, occupied, SOUTH) | rayAttacks(sq, occupied, WEST))
+
+def bishopAttacks(sq, occupied):
+    return (rayAttacks(sq, occupied, NORTHEAST) | rayAttacks(sq, occupied, NORTHWEST)
+            | rayAttacks(sq, occupied, SOUTHWEST) | rayAttacks(sq, occupied, SOUTHEAST))
+
+def queenAttacks(sq, occupied):
+    return rookAttacks(sq, occupied) | bishopAttacks(sq, occupied)
+
+def attacks(role, col, sq, occupied=0):
+    """Squares attacked by a piece of this role and color standing on sq."""
+    if role == 'p':
+        return PAWN_ATTACKS[col][sq]
+    elif role == 'n':
+        return KNIGHT_ATTACKS[sq]
+    elif role == 'k':
+        return KING_ATTACKS[sq]
+    elif role == 'b':
+        return bishopAttacks(sq, occupied)
+    elif role == 'r':
+        return rookAttacks(sq, occupied)
+    elif role == 'q':
+        return queenAttacks(sq, occupied)
+    return 0
+
+#empty-board reach by role, used for the geometric checks in Piece
+LINES = {'b': BISHOP_LINES, 'r': ROOK_LINES, 'q': QUEEN_LINES, 'n': KNIGHT_ATTACKS}
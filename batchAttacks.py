@@ -0,0 +1,171 @@
+import argparse
+import sys
+import time
+import numpy as np
+from tensor import PositionBatch, planesToMasks, lineFen
+
+#all masks are uint64 arrays, square 8 * rank + file as in bitboard.py
+FULL = np.uint64(0xFFFFFFFFFFFFFFFF)
+FILE_A = np.uint64(0x0101010101010101)
+FILE_B = FILE_A << np.uint64(1)
+FILE_G = FILE_A << np.uint64(6)
+FILE_H = FILE_A << np.uint64(7)
+RANK_3 = np.uint64(0xFF << 16)
+RANK_8 = np.uint64(0xFF << 56)
+
+#squares a shift by step can't reach without wrapping around the board edge are masked out
+STEP_MASKS = {
+    8: FULL, -8: FULL,
+    1: ~FILE_A, -1: ~FILE_H, 9: ~FILE_A, 7: ~FILE_H, -7: ~FILE_A, -9: ~FILE_H,
+    17: ~FILE_A, 15: ~FILE_H, 10: ~(FILE_A | FILE_B), 6: ~(FILE_G | FILE_H),
+    -6: ~(FILE_A | FILE_B), -10: ~(FILE_G | FILE_H), -15: ~FILE_A, -17: ~FILE_H,
+}
+ROOK_STEPS = (8, -8, 1, -1)
+BISHOP_STEPS = (9, 7, -7, -9)
+KING_STEPS = ROOK_STEPS + BISHOP_STEPS
+KNIGHT_STEPS = (17, 15, 10, 6, -6, -10, -15, -17)
+
+#castling squares seen from the side to move, after black positions are flipped: (right, rook square, squares to be empty, squares not attacked)
+CASTLES = (
+    (0, 7, (5, 6), (4, 5, 6)),
+    (1, 0, (1, 2, 3), (2, 3, 4)),
+)
+KING_SQUARE = np.uint64(1 << 4)
+
+def squareMask(squares):
+    return np.uint64(sum(1 << sq for sq in squares))
+
+def shift(masks, step):
+    if step > 0:
+        return (masks << np.uint64(step)) & STEP_MASKS[step]
+    return (masks >> np.uint64(-step)) & STEP_MASKS[step]
+
+def popcount(masks):
+    return np.bitwise_count(masks).astype(np.int64)
+
+def slide(sliders, empty, step):
+    """Squares attacked along one direction, all sliders of the batch at once."""
+    attacked = np.zeros_like(sliders)
+    ray = sliders
+    for distance in range(7):
+        ray = shift(ray, step)
+        attacked |= ray
+        ray &= empty
+    return attacked
+
+def attackedSquares(pieces, occupied, forward=True):
+    """Union of the squares attacked by (N, 6) masks in PNBRQK order. Pawns attack towards higher squares if forward."""
+    pawns, knights, bishops, rooks, queens, kings = pieces.T
+    empty = ~occupied
+    attacked = np.zeros_like(occupied)
+    for step in ((7, 9) if forward else (-7, -9)):
+        attacked |= shift(pawns, step)
+    for step in KNIGHT_STEPS:
+        attacked |= shift(knights, step)
+    for step in KING_STEPS:
+        attacked |= shift(kings, step)
+    for step in ROOK_STEPS:
+        attacked |= slide(rooks | queens, empty, step)
+    for step in BISHOP_STEPS:
+        attacked |= slide(bishops | queens, empty, step)
+    return attacked
+
+def toMasks(positions):
+    """(N, 12) uint64 masks in tensor.PLANE_CHARS order from masks, (N, 12, 8, 8) planes or a PositionBatch."""
+    if isinstance(positions, PositionBatch):
+        return positions.masks()
+    positions = np.asarray(positions)
+    return planesToMasks(positions) if positions.ndim == 4 else positions.astype(np.uint64)
+
+def attackMaps(positions):
+    """(N, 2) masks of the squares attacked by white and by black."""
+    masks = toMasks(positions)
+    occupied = np.bitwise_or.reduce(masks, axis=1)
+    return np.stack([attackedSquares(masks[:, :6], occupied, True), attackedSquares(masks[:, 6:], occupied, False)], axis=1)
+
+def analyse(positions, active, castling=None, enpassant=None):
+    """Attack maps, check and pseudo-legal move count of the side to move for a batch of positions.
+
+    active is 1 where white is to move, castling (N, 4) KQkq rights and enpassant the square or -1, as in tensor.PositionBatch.
+    Returns a dict of arrays: attacks (N, 2), inCheck (N,) and moves (N,)."""
+    masks = toMasks(positions)
+    n = len(masks)
+    white = np.asarray(active).astype(bool)
+    castling = np.zeros((n, 4), np.uint8) if castling is None else np.asarray(castling)
+    enpassant = np.full(n, -1) if enpassant is None else np.asarray(enpassant).astype(np.int64)
+
+    occupied = np.bitwise_or.reduce(masks, axis=1)
+    whiteAttacks = attackedSquares(masks[:, :6], occupied, True)
+    blackAttacks = attackedSquares(masks[:, 6:], occupied, False)
+
+    #flip the ranks of positions with black to move, so the side to move always moves north and castles on the first rank
+    us = np.where(white[:, None], masks[:, :6], masks[:, 6:].byteswap())
+    them = np.where(white[:, None], masks[:, 6:], masks[:, :6].byteswap())
+    theirAttacks = np.where(white, blackAttacks, whiteAttacks.byteswap())
+    rights = np.where(white[:, None], castling[:, :2], castling[:, 2:]).astype(bool)
+    enpassantMask = np.where(enpassant >= 0, np.uint64(1) << (np.maximum(enpassant, 0).astype(np.uint64) ^ np.where(white, 0, 56).astype(np.uint64)), np.uint64(0))
+
+    own = np.bitwise_or.reduce(us, axis=1)
+    enemy = np.bitwise_or.reduce(them, axis=1)
+    empty = ~(own | enemy)
+    notOwn = ~own
+    pawns, knights, bishops, rooks, queens, kings = us.T
+
+    #pawn moves onto the last rank count once per promotion piece
+    def pawnMoves(targets):
+        return popcount(targets & ~RANK_8) + 4 * popcount(targets & RANK_8)
+
+    single = shift(pawns, 8) & empty
+    moves = pawnMoves(single) + popcount(shift(single & RANK_3, 8) & empty)
+    for step in (7, 9):
+        moves += pawnMoves(shift(pawns, step) & (enemy | enpassantMask))
+
+    #every piece lands on a different square for a given step, so counting the shifted set counts the moves
+    for step in KNIGHT_STEPS:
+        moves += popcount(shift(knights, step) & notOwn)
+    for step in KING_STEPS:
+        moves += popcount(shift(kings, step) & notOwn)
+    for steps, sliders in ((ROOK_STEPS, rooks | queens), (BISHOP_STEPS, bishops | queens)):
+        for step in steps:
+            ray = sliders
+            for distance in range(7):
+                ray = shift(ray, step) & notOwn
+                moves += popcount(ray)
+                ray &= empty
+
+    for right, rookSquare, between, safe in CASTLES:
+        moves += (rights[:, right] & (kings & KING_SQUARE != 0) & (rooks >> np.uint64(rookSquare) & np.uint64(1) != 0)
+                  & (empty & squareMask(between) == squareMask(between)) & (theirAttacks & squareMask(safe) == 0))
+
+    return {
+        'attacks': np.stack([whiteAttacks, blackAttacks], axis=1),
+        'inCheck': kings & theirAttacks != 0,
+        'moves': moves,
+    }
+
+def analyseBatch(batch):
+    return analyse(batch.masks(), batch.active, batch.castling, batch.enpassant)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compute attack maps, checks and pseudo-legal move counts of the FENs of a file.')
+    parser.add_argument('path')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print the results of every position')
+    args = parser.parse_args(argv)
+
+    with open(args.path, encoding='utf-8') as stream:
+        fens = [lineFen(line) for line in stream if line.strip()]
+
+    batch = PositionBatch(len(fens))
+    batch.fill(fens)
+    start = time.perf_counter()
+    result = analyseBatch(batch)
+    seconds = time.perf_counter() - start
+
+    if args.verbose:
+        for fen, moves, inCheck in zip(fens, result['moves'], result['inCheck']):
+            print(f"{fen}: {moves} moves{', check' if inCheck else ''}")
+    print(f'{len(fens)} positions in {seconds:.3f}s ({len(fens) / seconds if seconds else 0:,.0f} positions/s)')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
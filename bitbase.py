@@ -0,0 +1,248 @@
+import argparse
+import functools
+import os
+import sys
+import time
+import numpy as np
+from game import Game
+from bitboard import lsb, popcount
+from attacks import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, LINES, BETWEEN
+
+#material sets: the pieces of the strong side besides its king, the weak side has a bare king
+MATERIALS = {'KQK': 'q', 'KRK': 'r', 'KPK': 'p', 'KBNK': 'bn'}
+#KPK promotions are looked up in the KQK and KRK bitbases, so those are generated first
+GENERATION_ORDER = ('KQK', 'KRK', 'KPK', 'KBNK')
+#the pawn may promote to these, a rook avoids some stalemates
+PROMOTIONS = ('KQK', 'KRK')
+#results from the point of view of the side to move
+WIN, DRAW, LOSS = 1, 0, -1
+
+MAGIC = b'BITBASE1'
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bitbases')
+
+#the attack tables as [square, target] arrays
+def tableArray(masks):
+    return np.array([[mask >> sq & 1 for sq in range(64)] for mask in masks], bool)
+
+ATTACK_ARRAYS = {'k': tableArray(KING_ATTACKS), 'n': tableArray(KNIGHT_ATTACKS), 'p': tableArray(PAWN_ATTACKS['w']),
+                 'b': tableArray(LINES['b']), 'r': tableArray(LINES['r']), 'q': tableArray(LINES['q'])}
+#[square, target, square in between]
+BETWEEN_ARRAY = np.array([[[BETWEEN[sq][newsq] >> between & 1 for between in range(64)] for newsq in range(64)] for sq in range(64)], bool)
+SQUARES = np.arange(64)
+
+def place(table, axes, ndim):
+    """View of a table with one axis per square, broadcastable over ndim square axes: the table axes go to the given axes."""
+    order = sorted(range(len(axes)), key=lambda index: axes[index])
+    shape = [1] * ndim
+    for axis in axes:
+        shape[axis] = 64
+    return table.transpose(order).reshape(shape)
+
+def allOf(arrays):
+    """Logical and of broadcastable arrays."""
+    return functools.reduce(np.logical_and, arrays)
+
+def tablePairs(table):
+    return [(sq, int(newsq)) for sq in range(64) for newsq in np.flatnonzero(table[sq])]
+
+class BitbaseGenerator:
+    """Retrograde analysis of a material set with a bare black king, on arrays with one axis per piece: white king, black king, then the other white pieces.
+
+    Moves come from the same attack tables Board and Move use. The result is one bit per position and side to move: white wins."""
+
+    def __init__(self, material, promotions=None):
+        self.material = material
+        self.pieces = MATERIALS[material]
+        self.ndim = 2 + len(self.pieces)
+        #black to move bitbases of the materials a pawn promotes to
+        self.promotions = promotions or {}
+
+        self.attacked = self.whiteAttacks()
+        self.valid = self.validPositions()
+        #black to move is in check, white to move can't leave the black king in check
+        inCheck = np.moveaxis(self.attacked, self.ndim, 1)[:, :, 0]
+        self.inCheck = self.valid & inCheck
+        self.validWhite = self.valid & ~inCheck
+
+    def index(self, axis, sq):
+        """Index of a position array with the square of one axis fixed, keeping the axis."""
+        index = [slice(None)] * self.ndim
+        index[axis] = slice(sq, sq + 1)
+        return tuple(index)
+
+    def whiteAttacks(self):
+        """[white king, 1, pieces..., square]: the squares attacked by white, with the black king taken off the board so it can't hide behind itself."""
+        ndim = self.ndim + 1
+        attacked = np.broadcast_to(place(ATTACK_ARRAYS['k'], (0, self.ndim), ndim), (64, 1) + (64,) * (ndim - 2)).copy()
+        for axis, role in enumerate(self.pieces, 2):
+            pieceAttacks = place(ATTACK_ARRAYS[role], (axis, self.ndim), ndim)
+            if role in 'brq':
+                for other in [0] + [other for other in range(2, self.ndim) if other != axis]:
+                    pieceAttacks = pieceAttacks & ~place(BETWEEN_ARRAY, (axis, self.ndim, other), ndim)
+            attacked |= pieceAttacks
+        return attacked
+
+    def validPositions(self):
+        valid = np.ones((64,) * self.ndim, bool)
+        for axis in range(self.ndim):
+            for other in range(axis + 1, self.ndim):
+                valid &= place(~np.eye(64, dtype=bool), (axis, other), self.ndim)
+        valid &= place(~ATTACK_ARRAYS['k'], (0, 1), self.ndim)
+        for axis, role in enumerate(self.pieces, 2):
+            if role == 'p':
+                valid &= place((SQUARES >= 8) & (SQUARES < 56), (axis,), self.ndim)
+        return valid
+
+    def blackLosses(self, wins):
+        """Black to move positions where every black move leads to a white win, or black is mated."""
+        escapes = np.zeros_like(self.valid)
+        for sq, newsq in self.kingPairs:
+            #a capture leaves a position that isn't valid in this material, so it isn't a win either and counts as escape
+            escapes[:, sq] |= self.legalKingMoves[sq, newsq] & ~wins[:, newsq]
+        return self.valid & ~escapes & (self.hasMove | self.inCheck)
+
+    def whiteWins(self, losses):
+        """White to move positions with a move to a black loss."""
+        wins = np.zeros_like(self.valid)
+        for sq, newsq in self.kingPairs:
+            wins[sq] |= losses[newsq]
+
+        others = lambda axis: [other for other in range(self.ndim) if other != axis]
+        for axis, role in enumerate(self.pieces, 2):
+            if role == 'p':
+                for sq in range(8, 56):
+                    if sq < 48:
+                        wins[self.index(axis, sq)] |= losses[self.index(axis, sq + 8)]
+                    else:
+                        for promotion in self.promotions.values():
+                            wins[self.index(axis, sq)] |= np.expand_dims(promotion[..., sq + 8], axis)
+                    if sq < 16:
+                        #the square passed by a double push has to be empty
+                        clear = allOf(place(SQUARES != sq + 8, (other,), self.ndim) for other in others(axis))
+                        wins[self.index(axis, sq)] |= losses[self.index(axis, sq + 16)] & clear
+                continue
+
+            for sq, newsq in tablePairs(ATTACK_ARRAYS[role]):
+                target = losses[self.index(axis, newsq)]
+                if role in 'brq':
+                    target = target & allOf(place(~BETWEEN_ARRAY[sq, newsq], (other,), self.ndim) for other in others(axis))
+                wins[self.index(axis, sq)] |= target
+
+        return self.validWhite & wins
+
+    def generate(self, info=None):
+        """Iterate until nothing changes. Returns (white to move wins, black to move losses) as bool arrays."""
+        self.kingPairs = tablePairs(ATTACK_ARRAYS['k'])
+        #[black king, target] moves not into attack, over the other axes
+        notAttacked = ~self.attacked[:, 0]
+        self.legalKingMoves = {(sq, newsq): notAttacked[..., newsq] for sq, newsq in self.kingPairs}
+        self.hasMove = np.zeros_like(self.valid)
+        for sq, newsq in self.kingPairs:
+            self.hasMove[:, sq] |= self.legalKingMoves[sq, newsq]
+
+        wins = np.zeros_like(self.valid)
+        iteration = 0
+        while True:
+            losses = self.blackLosses(wins)
+            newWins = self.whiteWins(losses)
+            iteration += 1
+            if info:
+                info(self.material, iteration, int(newWins.sum()), int(losses.sum()))
+            if (newWins == wins).all():
+                return wins, losses
+            wins = newWins
+
+def writeBitbase(path, material, wins, losses):
+    """File layout: magic, material name padded to 8 bytes, then the packed white to move and black to move bits."""
+    with open(path, 'wb') as stream:
+        stream.write(MAGIC + material.encode('ascii').ljust(8, b'\0'))
+        stream.write(np.packbits(wins, bitorder='little').tobytes())
+        stream.write(np.packbits(losses, bitorder='little').tobytes())
+
+def readBitbase(path):
+    """Returns (material, white to move bits, black to move bits) as bytes."""
+    with open(path, 'rb') as stream:
+        data = stream.read()
+    if data[:8] != MAGIC:
+        raise ValueError(f'{path} is not a bitbase file.')
+    material = data[8:16].rstrip(b'\0').decode('ascii')
+    half = (len(data) - 16) // 2
+    return material, data[16:16 + half], data[16 + half:]
+
+def generateAll(directory=DEFAULT_DIRECTORY, materials=GENERATION_ORDER, info=None):
+    os.makedirs(directory, exist_ok=True)
+    losses = {}
+    for material in GENERATION_ORDER:
+        if material not in materials and not (material in PROMOTIONS and 'KPK' in materials):
+            continue
+        promotions = {name: losses[name] for name in PROMOTIONS} if 'p' in MATERIALS[material] else None
+        generator = BitbaseGenerator(material, promotions)
+        wins, losses[material] = generator.generate(info)
+        writeBitbase(os.path.join(directory, f'{material}.bb'), material, wins, losses[material])
+
+class Bitbases:
+    """Probes the bitbase files of a directory, each is read the first time its material is on the board."""
+
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        self.directory = directory
+        #material: (white to move bits, black to move bits), None if there is no file
+        self.tables = {}
+
+    def table(self, material):
+        if material not in self.tables:
+            path = os.path.join(self.directory, f'{material}.bb')
+            self.tables[material] = readBitbase(path)[1:] if os.path.exists(path) else None
+        return self.tables[material]
+
+    def probe(self, board):
+        """WIN, DRAW or LOSS for the side to move, None if the material isn't covered."""
+        if popcount(board.allOccupied) > 4:
+            return None
+
+        white = ''.join(char.lower() * popcount(board.bitboards[char]) for char in 'QRBNP')
+        black = ''.join(char * popcount(board.bitboards[char]) for char in 'qrbnp')
+        if white and not black:
+            strong, pieces, flip = 'w', white, 0
+        elif black and not white:
+            strong, pieces, flip = 'b', black, 56
+        else:
+            return None
+
+        material = 'K' + pieces.upper() + 'K'
+        if material not in MATERIALS or self.table(material) is None:
+            return None
+
+        #the strong side is white in the bitbase, a black one is mirrored
+        kings = ('K', 'k') if strong == 'w' else ('k', 'K')
+        index = 0
+        for char in kings + tuple(pieces.upper() if strong == 'w' else pieces):
+            index = 64 * index + (lsb(board.bitboards[char]) ^ flip)
+
+        strongToMove = board.active == strong
+        bits = self.table(material)[0 if strongToMove else 1]
+        if not bits[index >> 3] >> (index & 7) & 1:
+            return DRAW
+        return WIN if strongToMove else LOSS
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate endgame bitbases, or probe a position.')
+    parser.add_argument('fen', nargs='?', default=None, help='position to probe, generates the bitbases if not given')
+    parser.add_argument('-m', '--materials', nargs='*', default=list(GENERATION_ORDER), help='material sets to generate')
+    parser.add_argument('--directory', default=DEFAULT_DIRECTORY, help='where the bitbase files are')
+    args = parser.parse_args(argv)
+
+    if args.fen:
+        result = Bitbases(args.directory).probe(Game(args.fen).board)
+        print({WIN: 'win', DRAW: 'draw', LOSS: 'loss', None: 'not in bitbases'}[result])
+        return 0
+
+    def info(material, iteration, wins, losses):
+        print(f'{material} iteration {iteration}: {wins} wins, {losses} losses')
+
+    start = time.perf_counter()
+    generateAll(args.directory, args.materials, info)
+    print(f'done in {time.perf_counter() - start:.1f}s')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+from pos import SQUARES
+
+#squares are indexed 8 * i + j, i.e. a1 = 0, b1 = 1, ..., h8 = 63
+FULL = (1 << 64) - 1
+
+def squareIndex(pos):
+    """Returns the bit index (0-63) of a square."""
+    return pos.sq
+
+def squarePos(sq):
+    """Returns the Pos object of a bit index."""
+    return SQUARES[sq]
+
+def bit(pos):
+    """Returns the single bit mask of a square."""
+    return 1 << pos.sq
+
+def lsb(mask):
+    """Returns the index of the least significant set bit."""
+    return (mask & -mask).bit_length() - 1
+
+def msb(mask):
+    """Returns the index of the most significant set bit."""
+    return mask.bit_length() - 1
+
+def popcount(mask):
+    return mask.bit_count()
+
+def iterBits(mask):
+    """Yields the indices of all set bits in ascending order."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def maskSquares(mask):
+    """Returns the list of Pos objects of all set bits."""
+    return [SQUARES[sq] for sq in iterBits(mask)]
+
+def maskStr(mask):
+    """Returns a printable 8x8 view of a mask, rank 8 on top."""
+    rows = []
+    for i in reversed(range(8)):
+        rows.append(' '.join('1' if mask >> (8 * i + j) & 1 else '.' for j in range(8)))
+    return '\n'.join(rows)
@@ -1,12 +1,40 @@
 from piece import Piece
 from pos import Pos
+from bitboard import FULL, squareIndex, squarePos, lsb, iterBits
+from zobrist import PIECE_KEYS, CASTLE_KEYS, SIDE_KEY, enpassantKey, positionKey
+from evaluation import MG_SCORES, EG_SCORES, PHASES
+from attacks import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, ROOK_LINES, BISHOP_LINES, BETWEEN, rookAttacks, bishopAttacks, attacks
+
+#rook moves belonging to each castle
+CASTLE_ROOK_MOVES = {
+    'K': (Pos(sqr='h1'), Pos(sqr='f1')),
+    'Q': (Pos(sqr='a1'), Pos(sqr='d1')),
+    'k': (Pos(sqr='h8'), Pos(sqr='f8')),
+    'q': (Pos(sqr='a8'), Pos(sqr='d8')),
+}
+
+#castle rights lost by moves touching these squares
+CASTLE_RIGHTS_LOST = {
+    Pos(sqr='e1'): 'KQ', Pos(sqr='h1'): 'K', Pos(sqr='a1'): 'Q',
+    Pos(sqr='e8'): 'kq', Pos(sqr='h8'): 'k', Pos(sqr='a8'): 'q',
+}
 
 class Board:
 
-    def __init__(self, fenPos='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR', castleRight={char: True for char in 'KQkq'}, enpassantPossible=None):
+    def __init__(self, fenPos='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR', castleRight={char: True for char in 'KQkq'}, enpassantPossible=None, active='w'):
+        #pieces by square, plus one occupancy mask per piece type (keys as in FEN), per color and for the whole board
+        self.pieces = {}
+        self.bitboards = {char: 0 for char in 'PNBRQKpnbrqk'}
+        self.occupied = {'w': 0, 'b': 0}
+        self.allOccupied = 0
+        self.zobristKey = 0
+        #evaluation terms, white minus black, kept up to date like the masks (see evaluation.py)
+        self.mgScore = 0
+        self.egScore = 0
+        self.phase = 0
+
         rows = fenPos.split('/')
         rows.reverse()
-        self.pieces = {}
         for i, row in enumerate(rows):
             j = 0
             for char in row:
@@ -15,11 +43,17 @@ class Board:
 
                 elif char.isalpha():
                     col = 'w' if char.isupper() else 'b'
-                    self.pieces[Pos(i, j)] = Piece(char, col)
+                    self.setPiece(Pos(i, j), char, col)
                     j += 1
 
-        self.castleRight = castleRight
-        self.enpassantPossible = enpassantPossible
+        self.castleRight = dict(castleRight)
+        self.enpassantPossible = enpassantPossible if enpassantPossible else Pos(sqr='-')
+        #color to move, switched by make() and unmake()
+        self.active = active
+        self.zobristKey = positionKey(self)
+
+        #undo records of the moves made with make(), most recent last
+        self.undoStack = []
 
     def __call__(self, pos):
         """Returns Piece Object at given position."""
@@ -30,7 +64,7 @@ class Board:
 
     def isEmpty(self, pos):
         """Returns wether a certain square is empty."""
-        return pos not in self.pieces
+        return not (pos.isOnBoard() and self.allOccupied >> squareIndex(pos) & 1)
 
     def sqrStr(self, pos):
         if self.isEmpty(pos):
@@ -73,34 +107,216 @@ class Board:
         return '/'.join(reversed(position))
 
     def copy(self):
-        return Board(self.fenPos(), self.castleRight, self.enpassantPossible)
+        return Board(self.fenPos(), self.castleRight, self.enpassantPossible, self.active)
+
+    def toggleMasks(self, pos, piece):
+        """Adds the piece to the masks of its square, or removes it if it is already set there."""
+        bit = 1 << squareIndex(pos)
+        char = str(piece)
+        self.zobristKey ^= PIECE_KEYS[char][pos.sq]
+        self.bitboards[char] ^= bit
+        self.occupied[piece.col] ^= bit
+        self.allOccupied ^= bit
+
+        sign = 1 if self.bitboards[char] & bit else -1
+        self.mgScore += sign * MG_SCORES[char][pos.sq]
+        self.egScore += sign * EG_SCORES[char][pos.sq]
+        self.phase += sign * PHASES[char]
+
+    def putPiece(self, pos, piece):
+        """Places an existing Piece object on an empty square."""
+        self.pieces[pos] = piece
+        self.toggleMasks(pos, piece)
 
     def setEmpty(self, pos):
-        self.pieces.pop(pos)
+        self.toggleMasks(pos, self.pieces.pop(pos))
 
     def setPiece(self, pos, role, col):
-        self.pieces[pos] = Piece(role, col)
+        if pos in self.pieces:
+            self.setEmpty(pos)
+
+        self.putPiece(pos, Piece(role, col))
 
     def movePiece(self, pos, newpos):
-        self.pieces[newpos] = self.pieces.pop(pos)
+        if newpos in self.pieces:
+            self.setEmpty(newpos)
+
+        piece = self.pieces.pop(pos)
+        self.toggleMasks(pos, piece)
+        self.putPiece(newpos, piece)
+
+    def make(self, move):
+        """Executes a move in place and pushes an undo record, so that unmake() can take it back."""
+        capturePos = None
+        if move.enpassant:
+            capturePos = Pos(move.pos.i, move.newpos.j)
+        elif move.newpos in self.pieces:
+            capturePos = move.newpos
+
+        captured = self.pieces[capturePos] if capturePos else None
+        self.undoStack.append((move, captured, capturePos, dict(self.castleRight), self.enpassantPossible, self.active, self.zobristKey))
+
+        if capturePos:
+            self.setEmpty(capturePos)
+
+        self.movePiece(move.pos, move.newpos)
+
+        if move.promotion:
+            self.setPiece(move.newpos, move.promotion, move.active)
+
+        elif move.castles:
+            self.movePiece(*CASTLE_ROOK_MOVES[move.castles])
+
+        #moving from or onto a king or rook home square loses the corresponding castle rights
+        for pos in (move.pos, move.newpos):
+            for char in CASTLE_RIGHTS_LOST.get(pos, ''):
+                if self.castleRight[char]:
+                    self.castleRight[char] = False
+                    self.zobristKey ^= CASTLE_KEYS[char]
+
+        newEnpassant = move.newEnpassant if move.newEnpassant else Pos(sqr='-')
+        self.zobristKey ^= enpassantKey(self.enpassantPossible) ^ enpassantKey(newEnpassant)
+        self.enpassantPossible = newEnpassant
+
+        #the opponent of the moving piece is to move
+        if self.active != move.piece.opcol:
+            self.active = move.piece.opcol
+            self.zobristKey ^= SIDE_KEY
+
+    def unmake(self):
+        """Takes back the last move made with make()."""
+        move, captured, capturePos, castleRight, enpassantPossible, active, zobristKey = self.undoStack.pop()
+        self.takeBack(move.pos, move.newpos, move.piece, move.castles, captured, capturePos)
+
+        self.castleRight = castleRight
+        self.enpassantPossible = enpassantPossible
+        self.active = active
+        self.zobristKey = zobristKey
+
+    def takeBack(self, pos, newpos, piece, castles='', captured=None, capturePos=None):
+        """Puts the pieces back as they were before the move from pos to newpos, piece is the one that moved (the pawn on promotions)."""
+        if castles:
+            rookPos, rookNewpos = CASTLE_ROOK_MOVES[castles]
+            self.movePiece(rookNewpos, rookPos)
+
+        self.setEmpty(newpos)
+        self.putPiece(pos, piece)
+
+        if captured:
+            self.putPiece(capturePos, captured)
 
     def populatedSquares(self):
         """Return a list of all non-empty squares."""
-        return [pos for pos in self.pieces if not self.isEmpty(pos)]
+        return [squarePos(sq) for sq in iterBits(self.allOccupied)]
 
     def squaresOfPlayer(self, col):
         """Return a list of all squares accommodating a piece of this player."""
-        return [pos for pos in self.populatedSquares() if self(pos).col == col]
+        return [squarePos(sq) for sq in iterBits(self.occupied[col])]
 
     def king(self, col):
         """Return position of King of this color."""
-        return [pos for pos in self.squaresOfPlayer(col) if self(pos).role == 'k'].pop()
+        return squarePos(lsb(self.bitboards['K' if col == 'w' else 'k']))
+
+    def attackers(self, pos, col, occupied=None):
+        """Return mask of the pieces of the given color attacking this square, sliders see through squares missing in occupied."""
+        if occupied is None:
+            occupied = self.allOccupied
+        sq = squareIndex(pos)
+        bitboards = self.bitboards
+        if col == 'w':
+            pawns, knights, bishops, rooks, queens, kings = (bitboards[char] for char in 'PNBRQK')
+        else:
+            pawns, knights, bishops, rooks, queens, kings = (bitboards[char] for char in 'pnbrqk')
+
+        #a pawn attacks sq iff a pawn of the other color on sq would attack the pawn's square
+        return ((PAWN_ATTACKS['b' if col == 'w' else 'w'][sq] & pawns)
+                | (KNIGHT_ATTACKS[sq] & knights)
+                | (KING_ATTACKS[sq] & kings)
+                | (rookAttacks(sq, occupied) & (rooks | queens))
+                | (bishopAttacks(sq, occupied) & (bishops | queens)))
+
+    def isAttacked(self, pos, col):
+        """Is this square attacked by a piece of the given color?"""
+        return self.attackers(pos, col) != 0
+
+    def reachableSquares(self, pos):
+        """Return list of squares the piece on pos can move to on this board, not considering checks and castle rights."""
+        return [squarePos(newsq) for newsq in iterBits(self.reachableMask(pos))]
+
+    def reachableMask(self, pos):
+        """Mask version of reachableSquares."""
+        piece = self(pos)
+        sq = squareIndex(pos)
+        own = self.occupied[piece.col]
+        if piece.role == 'p':
+            forward = 8 * piece.dir
+            targets = PAWN_ATTACKS[piece.col][sq] & (self.occupied[piece.opcol] | self.enpassantMask())
+            if not self.allOccupied >> (sq + forward) & 1:
+                targets |= 1 << (sq + forward)
+                if (sq >> 3) == (1 if piece.col == 'w' else 6) and not self.allOccupied >> (sq + 2 * forward) & 1:
+                    targets |= 1 << (sq + 2 * forward)
+
+        elif piece.role == 'k':
+            targets = piece.reach(sq) & ~own
+
+        else:
+            targets = attacks(piece.role, piece.col, sq, self.allOccupied) & ~own
+
+        return targets
+
+    def enpassantMask(self):
+        if self.enpassantPossible.isOnBoard():
+            return 1 << squareIndex(self.enpassantPossible)
+        return 0
+
+    def pinMask(self, pos, col):
+        """Return the line the piece of col on pos may move on if it is pinned to its king, a full mask otherwise."""
+        ksq = self.king(col).sq
+        if col == 'w':
+            rooks, bishops = self.bitboards['r'] | self.bitboards['q'], self.bitboards['b'] | self.bitboards['q']
+        else:
+            rooks, bishops = self.bitboards['R'] | self.bitboards['Q'], self.bitboards['B'] | self.bitboards['Q']
+
+        for sniper in iterBits((ROOK_LINES[ksq] & rooks) | (BISHOP_LINES[ksq] & bishops)):
+            if BETWEEN[ksq][sniper] & self.allOccupied == 1 << pos.sq:
+                return BETWEEN[ksq][sniper] | 1 << sniper
+
+        return FULL
+
+    def givesCheck(self, move):
+        """Does the move check the opponent? Found with attack lookups on the occupancy after the move, without making it."""
+        col, opcol = move.piece.col, move.piece.opcol
+        ksq = self.king(opcol).sq
+        sq, newsq = move.pos.sq, move.newpos.sq
+        occupied = (self.allOccupied & ~(1 << sq)) | 1 << newsq
+        role = move.promotion if move.promotion else move.piece.role
+        movedFrom = 1 << sq
+
+        if move.enpassant:
+            occupied &= ~(1 << (move.pos.i * 8 + move.newpos.j))
+
+        elif move.castles:
+            #only the rook can give check
+            rookPos, rookNewpos = CASTLE_ROOK_MOVES[move.castles]
+            occupied = (occupied & ~(1 << rookPos.sq)) | 1 << rookNewpos.sq
+            role, newsq = 'r', rookNewpos.sq
+            movedFrom |= 1 << rookPos.sq
+
+        #direct check
+        if attacks(role, col, newsq, occupied) >> ksq & 1:
+            return True
+
+        #discovered check by a slider behind the moved piece
+        if col == 'w':
+            rooks, bishops = self.bitboards['R'] | self.bitboards['Q'], self.bitboards['B'] | self.bitboards['Q']
+        else:
+            rooks, bishops = self.bitboards['r'] | self.bitboards['q'], self.bitboards['b'] | self.bitboards['q']
+
+        return bool((rookAttacks(ksq, occupied) & rooks & ~movedFrom) | (bishopAttacks(ksq, occupied) & bishops & ~movedFrom))
 
     def inCheck(self, col):
         """Is this King in check?"""
-        king = self.king(col)
-        oppPieceSquares = self.squaresOfPlayer(self(king).opcol)
-        return any(self(pos).isAttackingSquare(pos, king) and self.isPathClear(pos, king) for pos in oppPieceSquares)
+        return self.isAttacked(self.king(col), 'b' if col == 'w' else 'w')
 
     def isPathClear(self, pos, newpos):
         """Returns True if the squares between current and target square are empty and there's no piece of same color on the target square."""
@@ -109,12 +325,10 @@ class Board:
         if piece.role == 'n':
             return not target or self(newpos).col != piece.col
 
-        path = pos.path(newpos)
-        
-        if any(not self.isEmpty(pos) for pos in path[1:-1]):
+        if BETWEEN[squareIndex(pos)][squareIndex(newpos)] & self.allOccupied:
             return False
         
         if target and (target.col == piece.col or (piece.role == 'p' and pos.isSameFile(newpos) and target.col == piece.opcol)):
             return False
 
-        return True
\ No newline at end of file
+        return True
@@ -4,6 +4,9 @@ from PySide6.QtCore import *
 from move import Move
 from game import Game
 from pos import Pos
+from board import CASTLE_ROOK_MOVES
+
+HIGHLIGHT_THICKNESS = 5
 
 class BoardScene(QGraphicsScene):
     def __init__(self, parentLayout, game):
@@ -26,6 +29,11 @@ class BoardScene(QGraphicsScene):
         self.activePiece = None
         self.legalMoves = []
 
+        #piece item on each square, kept up to date by movePiece
+        self.pieceItems = {}
+        #[rect item, (pos, color) it shows or None], reused by updateHighlights
+        self.highlightPool = []
+
         self.state = 'idle'
         #state in [idle, draggingPiece, pieceSelected]
         
@@ -62,9 +70,10 @@ class BoardScene(QGraphicsScene):
 
     def boardSetup(self):
         for pos, piece in self.game.board.pieces.items():
-            piece = self.addPixmap(self.piecePix(piece.role, piece.col))
-            piece.setZValue(1)
-            piece.setPos(*self.posToOffset(pos))
+            item = self.addPixmap(self.piecePix(piece.role, piece.col))
+            item.setZValue(1)
+            item.setPos(*self.posToOffset(pos))
+            self.pieceItems[pos] = item
 
     def mouseposToPos(self, x, y):
         return Pos(7 - y // self.squareWidth, x // self.squareWidth)
@@ -72,47 +81,55 @@ class BoardScene(QGraphicsScene):
     def legalMovesActivePos(self):
         return self.game.legalMoves(self.game.active, self.clickPos)
 
-    def drawSquare(self, pos, color):
-        
-        if isinstance(pos, Pos):
-            thickness = 5
-            pen = QPen(QColor(color), thickness)
-            pen.setJoinStyle(Qt.MiterJoin)
-            x, y = self.posToOffset(pos)
-            self.addRect(x + thickness/2, y + thickness/2, self.squareWidth - thickness, self.squareWidth - thickness, pen)
-        
-        elif isinstance(pos, list):
-            for p in pos:
-                self.drawSquare(p, color)
+    def highlightRect(self, pos):
+        thickness = HIGHLIGHT_THICKNESS
+        x, y = self.posToOffset(pos)
+        return QRectF(x + thickness/2, y + thickness/2, self.squareWidth - thickness, self.squareWidth - thickness)
+
+    def drawHighlights(self, highlights):
+        """Show (pos, color) highlights with the rects of the pool. Only rects whose square or color changed are touched, unused ones are hidden."""
+        for index, highlight in enumerate(highlights):
+            if index == len(self.highlightPool):
+                self.highlightPool.append([self.addRect(QRectF()), None])
+
+            entry = self.highlightPool[index]
+            if entry[1] != highlight:
+                pos, color = highlight
+                pen = QPen(QColor(color), HIGHLIGHT_THICKNESS)
+                pen.setJoinStyle(Qt.MiterJoin)
+                entry[0].setPen(pen)
+                entry[0].setRect(self.highlightRect(pos))
+                entry[0].show()
+                entry[1] = highlight
+
+        for entry in self.highlightPool[len(highlights):]:
+            if entry[1] is not None:
+                entry[0].hide()
+                entry[1] = None
 
     def pieces(self):
-        return list(filter(lambda item: isinstance(item, QGraphicsPixmapItem) and item.zValue() > 0, self.items()))
+        return list(self.pieceItems.values())
 
     def getPieceAt(self, pos, notReturnActive=False):
-        x, y = self.posToOffset(pos)
-        if notReturnActive:
-            
-            items = self.items(QRectF(float(x), float(y), float(self.squareWidth), float(self.squareWidth)), order=Qt.DescendingOrder)
-            items = list(filter(lambda item: item.zValue() == 1, items))
-            return items.pop()            
-
-        return self.itemAt(x + 0.5 * self.squareWidth, y + 0.5 * self.squareWidth, QTransform())
+        #the map is keyed by board square, a dragged piece stays on its square until the move is made
+        item = self.pieceItems.get(pos)
+        if notReturnActive and item is self.activePiece:
+            return None
+        return item
 
     def updateHighlights(self, yellowHighlights=[]):
-        #clear all highlights
-        for item in filter(lambda item: isinstance(item, QGraphicsRectItem), self.items()):
-            self.removeItem(item)
-        
         #highlight given squares in organge (legal moves) 
-        self.drawSquare(yellowHighlights, 'orange')
+        highlights = [(pos, 'orange') for pos in yellowHighlights]
         
         #check
         if self.game.board.inCheck(self.game.active):
-            self.drawSquare(self.game.board.king(self.game.active), 'red')
+            highlights.append((self.game.board.king(self.game.active), 'red'))
         
         #selected piece
         if self.activePos:
-            self.drawSquare(self.activePos, QColor(0, 140, 250))
+            highlights.append((self.activePos, '#008cfa'))
+
+        self.drawHighlights(highlights)
 
     def movePiece(self, piece, newpos, pos=None, capture=False, promotion='', enpassant=False):
         
@@ -121,16 +138,18 @@ class BoardScene(QGraphicsScene):
 
         #move/remove other pieces when required
         if capture:
-            if enpassant:
-                self.removeItem(self.getPieceAt(Pos(pos.i, newpos.j), notReturnActive=True)) 
-            
-            else:
-                self.removeItem(self.getPieceAt(newpos, notReturnActive=True))
+            capturePos = Pos(pos.i, newpos.j) if enpassant else newpos
+            captured = self.pieceItems.pop(capturePos, None)
+            if captured:
+                self.removeItem(captured)
 
         if promotion:
             piece.setPixmap(self.piecePix(promotion, col))
 
         #move the piece
+        if pos is not None:
+            self.pieceItems.pop(pos, None)
+        self.pieceItems[newpos] = piece
         piece.setPos(*self.posToOffset(newpos))
 
     def mouseMoveEvent(self, event):
@@ -224,21 +243,12 @@ class BoardScene(QGraphicsScene):
     def makeMove(self, move: Move):
         if move.isLegal():
             self.game.turn(move)
-            self.movePiece(self.activePiece, move.newpos, move.pos, move.capture, move.promotion, move.enpassant)
+            self.movePiece(self.getPieceAt(move.pos), move.newpos, move.pos, move.capture, move.promotion, move.enpassant)
             
             #castles
             if move.castles:
-                if move.castles == 'K':
-                    self.movePiece(self.getPieceAt(Pos(sqr='h1')), Pos(sqr='f1'))
-                
-                elif move.castles == 'k':
-                    self.movePiece(self.getPieceAt(Pos(sqr='h8')), Pos(sqr='f8'))
-
-                elif move.castles == 'Q':
-                    self.movePiece(self.getPieceAt(Pos(sqr='a1')), Pos(sqr='d1'))
-
-                elif move.castles == 'q':
-                    self.movePiece(self.getPieceAt(Pos(sqr='a8')), Pos(sqr='d8'))
+                rookPos, rookNewpos = CASTLE_ROOK_MOVES[move.castles]
+                self.movePiece(self.getPieceAt(rookPos), rookNewpos, rookPos)
         
             self.parentLayout.updateGameInfo()
             if self.game.pgnDict['score']:
@@ -0,0 +1,149 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+from game import Game
+from pos import Pos
+from movegen import findMove
+from bitboard import iterBits
+from attacks import PAWN_ATTACKS
+from polyglotRandom import RANDOM64
+
+#book entries are 16 bytes, big endian: key, move, weight, learn data. They are sorted by key.
+ENTRY = struct.Struct('>QHHI')
+KEY = struct.Struct('>Q')
+
+#Polyglot piece kinds: black pawn 0, white pawn 1, black knight 2, ... white king 11
+PIECE_KINDS = {char: 2 * 'pnbrqk'.index(char.lower()) + char.isupper() for char in 'PNBRQKpnbrqk'}
+CASTLE_OFFSETS = {'K': 768, 'Q': 769, 'k': 770, 'q': 771}
+ENPASSANT_OFFSET = 772
+TURN_OFFSET = 780
+PROMOTION_ROLES = ' nbrq'
+#castling is stored as the king taking its own rook
+CASTLE_MOVES = {'e1h1': 'e1g1', 'e1a1': 'e1c1', 'e8h8': 'e8g8', 'e8a8': 'e8c8'}
+
+def polyglotKey(board):
+    """The Polyglot hash of a board. This is not Board.zobristKey, books use their own random numbers."""
+    key = 0
+    for char, kind in PIECE_KINDS.items():
+        for sq in iterBits(board.bitboards[char]):
+            key ^= RANDOM64[64 * kind + sq]
+
+    for char, offset in CASTLE_OFFSETS.items():
+        if board.castleRight[char]:
+            key ^= RANDOM64[offset]
+
+    #the en passant file only counts if a pawn of the side to move can take there
+    enpassant = board.enpassantPossible
+    if enpassant.isOnBoard():
+        opcol = 'b' if board.active == 'w' else 'w'
+        if PAWN_ATTACKS[opcol][enpassant.sq] & board.bitboards['P' if board.active == 'w' else 'p']:
+            key ^= RANDOM64[ENPASSANT_OFFSET + enpassant.j]
+
+    if board.active == 'w':
+        key ^= RANDOM64[TURN_OFFSET]
+
+    return key
+
+def bookMoveToUci(code):
+    """Coordinate notation of a book move: to square in bits 0-5, from square in bits 6-11, promotion piece in bits 12-14."""
+    toSq, fromSq, promotion = code & 63, code >> 6 & 63, code >> 12 & 7
+    return 'abcdefgh'[fromSq & 7] + str((fromSq >> 3) + 1) + 'abcdefgh'[toSq & 7] + str((toSq >> 3) + 1) + PROMOTION_ROLES[promotion].strip()
+
+class PolyglotBook:
+    """Polyglot .bin opening book, read through mmap. Lookups binary search the sorted keys, the file is never loaded as a whole."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        #an empty file can't be mapped
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.size = size // ENTRY.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    def __reduce__(self):
+        #worker processes map the file themselves, the pages are shared through the OS cache
+        return (PolyglotBook, (self.path,))
+
+    def close(self):
+        if self.map:
+            self.map.close()
+            self.map = b''
+        self.file.close()
+
+    def keyAt(self, index):
+        return KEY.unpack_from(self.map, index * ENTRY.size)[0]
+
+    def entries(self, key):
+        """Yields (uci, weight, learn) of the book entries of a key."""
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.keyAt(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        for index in range(low, self.size):
+            entryKey, code, weight, learn = ENTRY.unpack_from(self.map, index * ENTRY.size)
+            if entryKey != key:
+                break
+            yield (bookMoveToUci(code), weight, learn)
+
+    def moves(self, board):
+        """Returns [(Move, weight)] of the book moves for the side to move of board that are legal there."""
+        moves = []
+        for uci, weight, learn in self.entries(polyglotKey(board)):
+            piece = board(Pos(sqr=uci[:2]))
+            if uci in CASTLE_MOVES and piece and piece.role == 'k':
+                uci = CASTLE_MOVES[uci]
+            move = findMove(board, board.active, uci)
+            if move:
+                moves.append((move, weight))
+        return moves
+
+    def bestMove(self, board):
+        """The book move with the highest weight, None if the position is not in the book."""
+        moves = self.moves(board)
+        return max(moves, key=lambda entry: entry[1])[0] if moves else None
+
+    def weightedMove(self, board, rng=random):
+        """A book move chosen at random in proportion to the weights, None if the position is not in the book."""
+        moves = [(move, weight) for move, weight in self.moves(board) if weight]
+        if not moves:
+            return None
+        return rng.choices([move for move, weight in moves], weights=[weight for move, weight in moves])[0]
+
+def bookMove(game, book, best=False):
+    """Book move for the active player of a Game with a book that isn't its own (see Game.bookMove)."""
+    return book.bestMove(game.board) if best else book.weightedMove(game.board)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='List the moves a Polyglot book has for a position.')
+    parser.add_argument('path')
+    parser.add_argument('fen', nargs='?', default='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+    args = parser.parse_args(argv)
+
+    game = Game(args.fen)
+    with PolyglotBook(args.path) as book:
+        print(f'key {polyglotKey(game.board):016x}, {len(book)} entries in book')
+        moves = book.moves(game.board)
+        total = sum(weight for move, weight in moves)
+        for move, weight in sorted(moves, key=lambda entry: -entry[1]):
+            print(f'{str(move):<8} {move.uci():<6} {weight:>6} {100 * weight / total if total else 0:6.1f}%')
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
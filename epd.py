@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from game import Game, loadGame
+from pgn import parseSan
+from perft import perft
+from search import Search, DEFAULT_DEPTH, MAX_PLY
+from transposition import TranspositionTable
+
+#transposition table size of each worker process
+WORKER_TABLE_MB = 16
+#operations are separated by semicolons, operands may be quoted strings
+OPERATION_RE = re.compile(r'\s*([A-Za-z][A-Za-z0-9_]*)((?:\s*(?:"[^"]*"|[^\s;"]+))*)\s*(?:;|$)')
+OPERAND_RE = re.compile(r'"([^"]*)"|([^\s;"]+)')
+PERFT_RE = re.compile(r'^D(\d+)$')
+
+#table of this worker process, kept between tasks
+workerTable = None
+
+class EpdEntry:
+
+    def __init__(self, fen, operations, line=0):
+        self.fen = fen
+        #opcode: list of operands
+        self.operations = operations
+        self.line = line
+
+    @property
+    def id(self):
+        return self.operations.get('id', [str(self.line)])[0]
+
+    def perftCounts(self):
+        """{depth: expected node count} of the D<n> operations."""
+        counts = {}
+        for opcode, operands in self.operations.items():
+            match = PERFT_RE.match(opcode)
+            if match and operands:
+                counts[int(match.group(1))] = int(operands[0])
+        return counts
+
+def parseEpd(line, lineNumber=0):
+    """Parse an EPD line: four FEN fields, optionally the two FEN clocks (as written by perft suites), then the operations."""
+    fields = line.split(maxsplit=4)
+    if len(fields) < 4:
+        raise ValueError(f'Not an EPD line: {line.strip()}')
+
+    rest = fields[4] if len(fields) > 4 else ''
+    clocks = rest.split(maxsplit=2)
+    if len(clocks) >= 2 and clocks[0].isdigit() and clocks[1].isdigit():
+        halfmoves, fullmove = clocks[:2]
+        rest = clocks[2] if len(clocks) > 2 else ''
+    else:
+        halfmoves, fullmove = '0', '1'
+
+    operations = {}
+    for match in OPERATION_RE.finditer(rest.lstrip(';')):
+        operations[match.group(1)] = [quoted or plain for quoted, plain in OPERAND_RE.findall(match.group(2))]
+
+    halfmoves = operations.get('hmvc', [halfmoves])[0]
+    fullmove = operations.get('fmvn', [fullmove])[0]
+    return EpdEntry(' '.join(fields[:4] + [halfmoves, fullmove]), operations, lineNumber)
+
+def readEpd(path):
+    with open(path, encoding='utf-8') as stream:
+        return [parseEpd(line, number) for number, line in enumerate(stream, 1) if line.strip() and not line.lstrip().startswith('#')]
+
+def runEntry(entry, depth, movetime, nodes, perftDepth, tableMB=WORKER_TABLE_MB):
+    """Worker task: check the perft counts or search the position of an EpdEntry. Returns a result dict."""
+    global workerTable
+    result = {'id': entry.id, 'fen': entry.fen, 'nodes': 0, 'ok': True}
+    start = time.perf_counter()
+
+    counts = entry.perftCounts()
+    result['kind'] = 'perft' if counts else 'search'
+    try:
+        game = loadGame(entry.fen)
+    except ValueError:
+        #a bad position fails this entry only, the rest of the suite still runs
+        game = None
+        result['ok'] = False
+        result['error'] = 'bad FEN'
+
+    if game and counts:
+        result['expected'] = {}
+        result['got'] = {}
+        for countDepth, expected in sorted(counts.items()):
+            if perftDepth is not None and countDepth > perftDepth:
+                break
+            got = perft(Game(entry.fen), countDepth)
+            result['expected'][countDepth] = expected
+            result['got'][countDepth] = got
+            result['nodes'] += got
+            result['ok'] = result['ok'] and got == expected
+
+    elif game:
+        if workerTable is None or workerTable.sizeMB != tableMB:
+            workerTable = TranspositionTable(tableMB)
+        #every position starts with an empty table, so results don't depend on which worker ran what before
+        workerTable.clear()
+
+        result['expected'] = {'bm': entry.operations.get('bm', []), 'am': entry.operations.get('am', [])}
+        try:
+            bestMoves = [parseSan(game.board, game.active, san).uci() for san in entry.operations.get('bm', [])]
+            avoidMoves = [parseSan(game.board, game.active, san).uci() for san in entry.operations.get('am', [])]
+        except ValueError as error:
+            #a bad operand fails this position only, the rest of the suite still runs
+            result['ok'] = False
+            result['error'] = str(error)
+        else:
+            searchResult = Search(game.board, game.active, depth, movetime, nodes, table=workerTable).run()
+            best = searchResult.bestMove.uci() if searchResult.bestMove else ''
+            result['got'] = str(searchResult.bestMove) if searchResult.bestMove else '(none)'
+            result['score'] = searchResult.score
+            result['depth'] = searchResult.depth
+            result['nodes'] = searchResult.nodes
+            result['ok'] = (not bestMoves or best in bestMoves) and best not in avoidMoves
+
+    result['seconds'] = time.perf_counter() - start
+    result['nps'] = result['nodes'] / result['seconds'] if result['seconds'] else 0.0
+    return result
+
+def runSuite(entries, workers=None, depth=None, movetime=None, nodes=None, perftDepth=None, tableMB=WORKER_TABLE_MB):
+    """Run EPD entries over a pool of worker processes, one position per task. Returns the report dict."""
+    workers = workers if workers else (os.cpu_count() or 1)
+    if depth is None:
+        depth = DEFAULT_DEPTH if movetime is None and nodes is None else MAX_PLY
+
+    start = time.perf_counter()
+    args = [(entry, depth, movetime, nodes, perftDepth, tableMB) for entry in entries]
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(runEntry, *zip(*args))) if args else []
+    else:
+        results = [runEntry(*arg) for arg in args]
+    seconds = time.perf_counter() - start
+
+    solved = sum(1 for result in results if result['ok'])
+    totalNodes = sum(result['nodes'] for result in results)
+    return {
+        'positions': len(results),
+        'solved': solved,
+        'rate': solved / len(results) if results else 0.0,
+        'nodes': totalNodes,
+        'seconds': seconds,
+        'nps': totalNodes / seconds if seconds else 0.0,
+        'workers': workers,
+        'results': results,
+    }
+
+def formatReport(report):
+    lines = [f"{'id':<20} {'result':<6} {'nodes':>12} {'time':>8} {'nps':>10}  details"]
+    for result in report['results']:
+        if 'error' in result:
+            details = f"error: {result['error']}"
+        elif result['kind'] == 'perft':
+            details = ' '.join(f"D{countDepth} {got}" + ('' if got == result['expected'][countDepth] else f" (expected {result['expected'][countDepth]})")
+                               for countDepth, got in result['got'].items())
+        else:
+            expected = ' '.join(f"{opcode} {' '.join(sans)}" for opcode, sans in result['expected'].items() if sans)
+            details = f"{result['got']} ({expected}) score {result['score']} depth {result['depth']}"
+        lines.append(f"{result['id'][:20]:<20} {'ok' if result['ok'] else 'FAILED':<6} {result['nodes']:>12} {result['seconds']:>8.3f} {result['nps']:>10,.0f}  {details}")
+
+    lines.append(f"solved {report['solved']}/{report['positions']} ({100 * report['rate']:.1f}%), {report['nodes']} nodes in {report['seconds']:.3f}s ({report['nps']:,.0f} nps, {report['workers']} workers)")
+    return '\n'.join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run an EPD test suite: bm/am operations are searched, D<n> operations are checked with perft.')
+    parser.add_argument('path')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='worker processes, defaults to the number of CPUs')
+    parser.add_argument('-d', '--depth', type=int, default=None, help='search depth per position')
+    parser.add_argument('-t', '--movetime', type=float, default=None, help='search time per position in seconds')
+    parser.add_argument('-n', '--nodes', type=int, default=None, help='search node budget per position')
+    parser.add_argument('--perft-depth', type=int, default=None, help='only check perft counts up to this depth')
+    parser.add_argument('--hash', type=int, default=WORKER_TABLE_MB, help='transposition table size per worker in MB')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    report = runSuite(readEpd(args.path), args.workers, args.depth, args.movetime, args.nodes, args.perft_depth, args.hash)
+    print(json.dumps(report, indent=2) if args.json else formatReport(report))
+    return 0 if report['solved'] == report['positions'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
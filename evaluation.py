@@ -0,0 +1,126 @@
+#piece values in the middlegame and the endgame
+MG_VALUES = {'p': 82, 'n': 337, 'b': 365, 'r': 477, 'q': 1025, 'k': 0}
+EG_VALUES = {'p': 94, 'n': 281, 'b': 297, 'r': 512, 'q': 936, 'k': 0}
+
+#game phase from the pieces left: 24 with all pieces on the board, 0 with only kings and pawns
+PHASE_WEIGHTS = {'p': 0, 'n': 1, 'b': 1, 'r': 2, 'q': 4, 'k': 0}
+MAX_PHASE = 24
+
+#piece-square tables from white's point of view, rank 8 first as on a diagram
+PAWN_TABLE = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+)
+PAWN_EG_TABLE = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+     80,  80,  80,  80,  80,  80,  80,  80,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     30,  30,  30,  30,  30,  30,  30,  30,
+     15,  15,  15,  15,  15,  15,  15,  15,
+      5,   5,   5,   5,   5,   5,   5,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+)
+KNIGHT_TABLE = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+BISHOP_TABLE = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+ROOK_TABLE = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0,
+)
+QUEEN_TABLE = (
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+)
+KING_TABLE = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20,
+)
+KING_EG_TABLE = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+)
+
+MG_TABLES = {'p': PAWN_TABLE, 'n': KNIGHT_TABLE, 'b': BISHOP_TABLE, 'r': ROOK_TABLE, 'q': QUEEN_TABLE, 'k': KING_TABLE}
+EG_TABLES = {'p': PAWN_EG_TABLE, 'n': KNIGHT_TABLE, 'b': BISHOP_TABLE, 'r': ROOK_TABLE, 'q': QUEEN_TABLE, 'k': KING_EG_TABLE}
+
+def squareScores(values, tables, char):
+    """Value plus table entry of a piece (FEN char) on each square, negative for black. Square sq of white is row sq ^ 56 of the diagram, black is mirrored."""
+    role = char.lower()
+    if char.isupper():
+        return tuple(values[role] + tables[role][sq ^ 56] for sq in range(64))
+    return tuple(-values[role] - tables[role][sq] for sq in range(64))
+
+#(middlegame, endgame) score of each piece on each square, white minus black, as kept by Board
+MG_SCORES = {char: squareScores(MG_VALUES, MG_TABLES, char) for char in 'PNBRQKpnbrqk'}
+EG_SCORES = {char: squareScores(EG_VALUES, EG_TABLES, char) for char in 'PNBRQKpnbrqk'}
+PHASES = {char: PHASE_WEIGHTS[char.lower()] for char in 'PNBRQKpnbrqk'}
+
+def taper(mgScore, egScore, phase):
+    phase = min(phase, MAX_PHASE)
+    return (mgScore * phase + egScore * (MAX_PHASE - phase)) // MAX_PHASE
+
+def evaluate(board, col):
+    """Tapered material and piece-square score from the point of view of col, from the terms the board keeps up to date."""
+    score = taper(board.mgScore, board.egScore, board.phase)
+    return score if col == 'w' else -score
+
+def recompute(board):
+    """Compute (middlegame score, endgame score, phase) of a board from scratch, for setup and verification."""
+    mgScore = egScore = phase = 0
+    for pos, piece in board.pieces.items():
+        char = str(piece)
+        mgScore += MG_SCORES[char][pos.sq]
+        egScore += EG_SCORES[char][pos.sq]
+        phase += PHASES[char]
+    return (mgScore, egScore, phase)
+
+def isConsistent(board):
+    return recompute(board) == (board.mgScore, board.egScore, board.phase)
@@ -1,15 +1,20 @@
+from array import array
 from pos import Pos
 from board import Board
 from move import Move
 from piece import Piece
+from movegen import generateLegalMoves
+from bitboard import SQUARES, popcount
+from moveCode import encodeMove, decodeMove, encodeUndo, decodeUndo, moveFromCode, codeToUci, PROMOTION, ENPASSANT, KING_CASTLE, QUEEN_CASTLE
 
 class Game:
 
-    def __init__(self, fen='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'):
+    def __init__(self, fen='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', lazySan=False, book=None):
+        self.startFen = fen
         #FEN syntax: <position> <color to move> <castle rights> <possible en passant> <halfmoves since last capture/pawn move> <current fullmove> 
         fen = fen.split(' ')
         castleRight = {char: (char in fen[2]) for char in 'KQkq'}
-        self.board = Board(fen[0], castleRight, Pos(sqr=fen[3]))
+        self.board = Board(fen[0], castleRight, Pos(sqr=fen[3]), fen[1])
         self.active = fen[1]
         self.passive = 'w' if self.active == 'b' else 'b' #not self.active
         self.halfmoveClock = 0
@@ -19,17 +24,37 @@ class Game:
             self.pgnDict[1] = ['...']
         self.pgnDict['score'] = []
 
+        #position keys of the game so far and how often each occurred, for repetition detection
+        self.keyHistory = array('Q', [self.board.zobristKey])
+        self.keyCounts = {self.board.zobristKey: 1}
+
+        #(position key, color to move) and the status() of that position
+        self.statusCache = (None, '')
+
+        #16 bit codes of the moves played and 32 bit records of what each move destroyed, see moveCode.py
+        self.moveHistory = array('H')
+        self.undoHistory = array('I')
+
+        #with lazySan the SAN for pgnDict is only built when PGN() is called, on a separate board that has replayed the first sanCount moves
+        self.lazySan = lazySan
+        self.sanCount = 0
+        self.sanBoard = None
+
+        #opening book (book.PolyglotBook) or None
+        self.book = book
+
     def __str__(self):
         return str(f'{str(self.board)} \n FEN: {self.FEN()} \n PGN: {self.PGN()}')
 
     def FEN(self):
-        castleRight = ''.join([char for (char, val) in self.board.castleRight.items() if val])
+        castleRight = ''.join([char for (char, val) in self.board.castleRight.items() if val]) or '-'
 
         return ' '.join([self.board.fenPos(), self.active, castleRight, str(self.board.enpassantPossible), str(self.halfmoveClock), str(self.currentMove)])
 
     def addPgnEntry(self, pgnEntry):
         if self.checkmate():
-            pgnEntry = pgnEntry[:-1] + '#'
+            if pgnEntry:
+                pgnEntry = pgnEntry[:-1] + '#'
             if self.active == 'w':
                 self.pgnDict['score'] = (1, 0)
             else:
@@ -38,13 +63,44 @@ class Game:
         if self.stalemate():
             self.pgnDict['score'] = (0.5, 0.5)
 
-        if self.active == 'w':
-            self.pgnDict[self.currentMove] = [pgnEntry]
+        #with lazySan the entries are written by buildSan()
+        if pgnEntry is not None:
+            self.writePgnEntry(self.currentMove, self.active, pgnEntry)
+
+    def writePgnEntry(self, moveNumber, col, pgnEntry):
+        if col == 'w':
+            self.pgnDict[moveNumber] = [pgnEntry]
         
         else:
-            self.pgnDict[self.currentMove].append(pgnEntry)
+            self.pgnDict[moveNumber].append(pgnEntry)
+
+    def buildSan(self):
+        """Writes the SAN of the moves not yet in pgnDict, continuing the replay where the last call stopped."""
+        if self.sanBoard is None:
+            start = Game(self.startFen)
+            self.sanBoard, self.sanActive, self.sanMoveNumber = start.board, start.active, 1
+
+        for code in self.moveHistory[self.sanCount:]:
+            move = moveFromCode(self.sanBoard, self.sanActive, code)
+            pgnEntry = str(move)
+            self.sanBoard.make(move)
+            self.sanCount += 1
+
+            #only the last move can be mate
+            if self.sanCount == len(self.moveHistory) and self.checkmate(self.active):
+                pgnEntry = pgnEntry[:-1] + '#'
+
+            self.writePgnEntry(self.sanMoveNumber, self.sanActive, pgnEntry)
+            if self.sanActive == 'b':
+                self.sanMoveNumber += 1
+            self.sanActive = 'b' if self.sanActive == 'w' else 'w'
+
+        self.sanBoard.undoStack.clear()
 
     def PGN(self):
+        if self.lazySan:
+            self.buildSan()
+
         score = '-'.join([str(x) for x in self.pgnDict['score']])
         return '\n'.join([f'{str(k)}. ' + ' '.join(v) for k, v in self.pgnDict.items() if isinstance(k, int)]) + ' ' + score
         
@@ -80,20 +136,16 @@ class Game:
                 newpos = Pos(sqr=input('To: '))
                 thisMove = Move(self.board, pos, newpos, self.active)
         
-        #keeping track of en passant
-        if thisMove.newEnpassant:
-            self.board.enpassantPossible = thisMove.newEnpassant
-        else:
-            self.board.enpassantPossible = Pos(sqr='-')
-
-        if thisMove.castles:
-            self.board.castleRight[thisMove.castles] = False
-        
-        pgnEntry = str(thisMove)
+        pgnEntry = None if self.lazySan else str(thisMove)
 
-        #execute move
+        #execute move, this also keeps track of en passant and castle rights
         thisMove.execute()
 
+        #keep a compact record instead of the board's undo record
+        _, captured, _, castleRight, enpassantPossible, _, _ = self.board.undoStack.pop()
+        self.moveHistory.append(encodeMove(thisMove))
+        self.undoHistory.append(encodeUndo(captured, castleRight, enpassantPossible, self.halfmoveClock))
+
         #adding after execution to be able to check for checkmate/stalemate
         self.addPgnEntry(pgnEntry)
 
@@ -106,32 +158,134 @@ class Game:
         if self.active == 'b':
             self.currentMove += 1
 
+        key = self.board.zobristKey
+        self.keyHistory.append(key)
+        self.keyCounts[key] = self.keyCounts.get(key, 0) + 1
+
         #50 move rule
         if self.halfmoveClock == 50 and not self.pgnDict['score']:
             self.pgnDict['score'] = (0.5, 0.5)
 
+        #threefold repetition
+        if self.isRepetition(3) and not self.pgnDict['score']:
+            self.pgnDict['score'] = (0.5, 0.5)
+
         self.active, self.passive = self.passive, self.active
         #print(self)      
 
+    def undo(self):
+        """Take back the last halfmove."""
+        if not self.moveHistory:
+            return
+
+        sq, newsq, flags = decodeMove(self.moveHistory.pop())
+        captured, castleRight, enpassantPossible, self.halfmoveClock = decodeUndo(self.undoHistory.pop())
+        key = self.keyHistory.pop()
+        self.keyCounts[key] -= 1
+        if not self.keyCounts[key]:
+            del self.keyCounts[key]
+
+        pos, newpos = SQUARES[sq], SQUARES[newsq]
+        piece = self.board(newpos)
+        if flags & PROMOTION:
+            piece = Piece('p', piece.col)
+
+        castles = ''
+        if flags in (KING_CASTLE, QUEEN_CASTLE):
+            castles = 'K' if flags == KING_CASTLE else 'Q'
+            if piece.col == 'b':
+                castles = castles.lower()
+
+        capturePos = Pos(pos.i, newpos.j) if flags == ENPASSANT else newpos
+        capturedPiece = Piece(captured, 'w' if captured.isupper() else 'b') if captured else None
+        self.board.takeBack(pos, newpos, piece, castles, capturedPiece, capturePos)
+        self.board.castleRight = castleRight
+        self.board.enpassantPossible = enpassantPossible
+        self.board.active = piece.col
+        self.board.zobristKey = self.keyHistory[-1]
+
+        self.active, self.passive = self.passive, self.active
+        if self.active == 'b':
+            self.currentMove -= 1
+        self.pgnDict['score'] = []
+
+        #remove the PGN entry, or in lazy mode start the SAN replay over if it got past this move
+        if not self.lazySan:
+            self.pgnDict[self.currentMove].pop()
+            if not self.pgnDict[self.currentMove]:
+                del self.pgnDict[self.currentMove]
+
+        elif self.sanCount > len(self.moveHistory):
+            for moveNumber in [k for k in self.pgnDict if isinstance(k, int)]:
+                del self.pgnDict[moveNumber]
+            if Game(self.startFen).active == 'b':
+                self.pgnDict[1] = ['...']
+            self.sanBoard = None
+            self.sanCount = 0
+
+    def uciMoves(self):
+        """The moves played in coordinate notation."""
+        return [codeToUci(code) for code in self.moveHistory]
+
+    def isRepetition(self, count=3):
+        """Has the current position occurred at least count times?"""
+        return self.keyCounts.get(self.board.zobristKey, 0) >= count
+
+    def status(self, col=None):
+        """Returns 'checkmate', 'stalemate' or '' with col to move. Computed once per position and cached."""
+        if col is None:
+            col = self.passive
+
+        key = (self.board.zobristKey, col)
+        if self.statusCache[0] != key:
+            status = ''
+            if not self.hasLegalMove(col):
+                status = 'checkmate' if self.board.inCheck(col) else 'stalemate'
+            self.statusCache = (key, status)
+
+        return self.statusCache[1]
+
     def checkmate(self, passive=None):
-        if passive is None:
-            passive = self.passive
-        return self.board.inCheck(passive) and not self.legalMoves(passive)
+        return self.status(passive) == 'checkmate'
 
     def stalemate(self, passive=None):
-        if passive is None:
-            passive = self.passive
-        return not self.board.inCheck(self.passive) and not self.legalMoves(self.passive)
+        return self.status(passive) == 'stalemate'
+
+    def iterLegalMoves(self, col, pos=None):
+        """Yields the legal moves one at a time."""
+        if pos and not self.board(pos):
+            return iter(())
+
+        return generateLegalMoves(self.board, col, pos)
+
+    def bookMove(self, best=False):
+        """Move of the opening book for the active player: the one with the highest weight if best, else chosen by weight. None without a book or out of book."""
+        if not self.book:
+            return None
+        return self.book.bestMove(self.board) if best else self.book.weightedMove(self.board)
+
+    def hasLegalMove(self, col, pos=None):
+        """Stops at the first legal move found."""
+        return next(self.iterLegalMoves(col, pos), None) is not None
 
     def legalMoves(self, col, pos=None):
-        moves = []
-        if pos and self.board(pos):
-            moves = [ Move(self.board, pos, newpos, col) for newpos in self.board(pos).squaresInReach(pos) ]
-            
-        else:
-            moves = [ Move(self.board, pos, newpos, col) for pos in self.board.squaresOfPlayer(col) for newpos in self.board(pos).squaresInReach(pos) ]
+        return list(self.iterLegalMoves(col, pos))
+
+def loadGame(fen, lazySan=False):
+    """Game of a FEN, ValueError if it isn't a position to play from: one king each and the side not to move not in check."""
+    try:
+        game = Game(fen, lazySan)
+    except Exception as error:
+        raise ValueError(f'Invalid FEN: {fen}') from error
 
-        return [ move for move in moves if move.isLegal() ]
+    board = game.board
+    if game.active not in ('w', 'b'):
+        raise ValueError(f'Invalid FEN: {fen}')
+    if popcount(board.bitboards['K']) != 1 or popcount(board.bitboards['k']) != 1:
+        raise ValueError(f'Invalid position, each side needs one king: {fen}')
+    if board.inCheck(game.passive):
+        raise ValueError(f'Invalid position, the side not to move is in check: {fen}')
+    return game
 
 if __name__ == '__main__':
     game = Game()
@@ -141,21 +295,13 @@ if __name__ == '__main__':
     while True:
         game.turn()
 
-        if game.checkmate():
-            game.PGN += '#'
-            if game.active == 'w':
-                game.PGN += ' 0-1'
-            else:
-                game.PGN += ' 1-0'
+        #the result was found (and cached) while adding the PGN entry
+        if game.checkmate(game.active):
             print(game)
             print(f'{game.passive.upper()} wins the match by checkmate!')
             break
 
-        elif game.board.inCheck(game.active):
-            game.PGN += '+'
-
-        elif game.stalemate():
-            game.PGN += ' 0.5-0.5'
+        elif game.stalemate(game.active):
             print(game)
             print('Draw by stalemate.')
-            break
\ No newline at end of file
+            break
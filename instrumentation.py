@@ -0,0 +1,145 @@
+import argparse
+import functools
+import importlib
+import json
+import sys
+import time
+
+#hot paths as 'module:Class.method'. Methods are patched on their class, so every caller is counted.
+#Module functions can be given as 'module:function', but modules that imported the function by name keep calling the original.
+HOT_PATHS = (
+    'board:Board.copy',
+    'board:Board.inCheck',
+    'board:Board.make',
+    'board:Board.unmake',
+    'board:Board.attackers',
+    'move:Move.isLegal',
+    'move:Move.leavesKingInCheck',
+    'move:Move.__str__',
+    'piece:Piece.squaresInReach',
+    'game:Game.turn',
+)
+
+def resolve(target):
+    """Returns (owner object, attribute name) of a 'module:Class.method' or 'module:function' target."""
+    moduleName, _, path = target.partition(':')
+    owner = importlib.import_module(moduleName)
+    names = path.split('.')
+    for name in names[:-1]:
+        owner = getattr(owner, name)
+    return owner, names[-1]
+
+class Instrumentation:
+    """Counts calls and accumulates time of hot paths. Wrappers are only installed while enabled, so there is no cost when it is off.
+
+    Times are inclusive: a recursive method counts the time of its inner calls again."""
+
+    def __init__(self, targets=HOT_PATHS):
+        self.targets = tuple(targets)
+        #target: [calls, seconds]
+        self.stats = {target: [0, 0.0] for target in self.targets}
+        #target: (owner, name, original attribute) while enabled
+        self.originals = {}
+        self.startTime = None
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    @property
+    def enabled(self):
+        return bool(self.originals)
+
+    def enable(self):
+        if self.enabled:
+            return
+        for target in self.targets:
+            owner, name = resolve(target)
+            original = owner.__dict__[name] if isinstance(owner, type) else getattr(owner, name)
+            self.originals[target] = (owner, name, original)
+            setattr(owner, name, self.wrap(original, self.stats[target]))
+        self.startTime = time.perf_counter()
+
+    def disable(self):
+        if not self.enabled:
+            return
+        for owner, name, original in self.originals.values():
+            setattr(owner, name, original)
+        self.originals = {}
+        self.seconds += time.perf_counter() - self.startTime
+        self.startTime = None
+
+    @staticmethod
+    def wrap(function, stats):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stats[0] += 1
+                stats[1] += time.perf_counter() - start
+        return wrapper
+
+    def reset(self):
+        for stats in self.stats.values():
+            stats[0], stats[1] = 0, 0.0
+        self.seconds = 0.0
+        if self.startTime is not None:
+            self.startTime = time.perf_counter()
+
+    def snapshot(self):
+        """Dict with the instrumented wall time and calls, seconds and microseconds per call of every target."""
+        seconds = self.seconds + (time.perf_counter() - self.startTime if self.startTime is not None else 0.0)
+        paths = {}
+        for target, (calls, targetSeconds) in self.stats.items():
+            paths[target] = {
+                'calls': calls,
+                'seconds': targetSeconds,
+                'usPerCall': 1e6 * targetSeconds / calls if calls else 0.0,
+                'share': targetSeconds / seconds if seconds else 0.0,
+            }
+        return {'seconds': seconds, 'paths': paths}
+
+    def report(self):
+        """The snapshot as a text table, slowest path first."""
+        snapshot = self.snapshot()
+        lines = [f"{'path':<32} {'calls':>12} {'seconds':>10} {'us/call':>10} {'share':>7}"]
+        for target, stats in sorted(snapshot['paths'].items(), key=lambda item: -item[1]['seconds']):
+            lines.append(f"{target.partition(':')[2]:<32} {stats['calls']:>12} {stats['seconds']:>10.3f} {stats['usPerCall']:>10.2f} {100 * stats['share']:>6.1f}%")
+        lines.append(f"instrumented for {snapshot['seconds']:.3f}s")
+        return '\n'.join(lines)
+
+    def json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+def instrument(targets=HOT_PATHS):
+    """Context manager: with instrument() as counters: ...; print(counters.report())"""
+    return Instrumentation(targets)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run perft or a search with the hot paths instrumented and report where the time goes.')
+    parser.add_argument('fen', nargs='?', default='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+    parser.add_argument('--perft', type=int, default=None, help='run perft to this depth')
+    parser.add_argument('--search', type=int, default=None, help='search to this depth (the default, depth 4)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    from game import Game
+    with instrument() as counters:
+        if args.perft is not None:
+            from perft import perft
+            perft(Game(args.fen), args.perft)
+        else:
+            from search import search
+            search(args.fen, args.search or 4)
+
+    print(counters.json() if args.json else counters.report())
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,19 @@
 from pos import Pos
 from piece import Piece
 from board import Board
+from bitboard import SQUARES, iterBits
+from attacks import attacks
 
 class Move:
 
-    def __init__(self, board, pos, newpos, active, isPlayerMove=False):
+    def __init__(self, board, pos, newpos, active, isPlayerMove=False, promoteTo=''):
         self.board = board
         self.piece = board(pos)
         self.active = active
         self.pos = pos
         self.newpos = newpos
         self.isPlayerMove = isPlayerMove
+        self.promoteTo = promoteTo
         
         self.capture = '' 
         self.castles = ''
@@ -22,8 +25,19 @@ class Move:
             self.detectNewEnpassantPossible()
             self.detectEnpassant()
             self.detectPromotion()
+        elif self.piece.role == 'k':
+            self.detectCastles()
         self.detectCapture()
-            
+
+    def detectCastles(self):
+        #a king moving two files from its initial square, whether the castle is allowed is checked in isLegal
+        if self.pos.isSameRank(self.newpos) and self.pos.fileDistance(self.newpos) == 2:
+            if self.active == 'w' and str(self.pos) == 'e1' and str(self.newpos) in ['g1', 'c1']:
+                self.castles = 'K' if str(self.newpos) == 'g1' else 'Q'
+
+            elif self.active == 'b' and str(self.pos) == 'e8' and str(self.newpos) in ['g8', 'c8']:
+                self.castles = 'k' if str(self.newpos) == 'g8' else 'q'
+
     def detectEnpassant(self):
         if self.board.enpassantPossible == self.newpos:
             self.enpassant = True
@@ -43,8 +57,8 @@ class Move:
 
     def detectPromotion(self):
         if self.piece.role == 'p' and (self.active == 'w' and self.newpos.rank == 8) or (self.active == 'b' and self.newpos.rank == 1):
-            promoteTo = None
-            if not self.isPlayerMove:
+            promoteTo = self.promoteTo
+            if not promoteTo and not self.isPlayerMove:
                 promoteTo = 'q'
 
             while not promoteTo in ['q', 'r', 'n', 'b']:
@@ -60,7 +74,7 @@ class Move:
 
     def isLegal(self, isPlayerMove=False):
         #there is a piece at pos belonging to active player
-        if not self.piece or not self.active == self.active:
+        if not self.piece or not self.piece.col == self.active:
             return False
 
         #newpos is on the board
@@ -83,6 +97,9 @@ class Move:
 
         #castles
         if self.piece.role == 'k' and self.newpos.fileDistance(self.pos) == 2:
+            if not self.castles or not self.board.castleRight[self.castles]:
+                return False
+
             #king is in check
             if self.board.inCheck(self.active):
                 return False
@@ -91,31 +108,9 @@ class Move:
             if Move(self.board, self.pos, Pos(self.newpos.i, int((self.newpos.j + self.pos.j)/2)), self.active).leavesKingInCheck(self.active):
                 return False
 
-            if self.active == 'w' and str(self.pos) == 'e1':
-                if str(self.newpos) == 'g1':
-                    if self.board.castleRight['K']:
-                        self.castles = 'K'
-                    else:
-                        return False
-
-                elif str(self.newpos) == 'c1':
-                    if self.board.castleRight['Q']:
-                        self.castles = 'Q'
-                    else:
-                        return False
-            
-            elif self.active == 'b' and str(self.pos) == 'e8':
-                if str(self.newpos) == 'g8':
-                    if self.board.castleRight['k']:
-                        self.castles = 'k'
-                    else:
-                        return False
-
-                elif str(self.newpos) == 'c8':
-                    if self.board.castleRight['q']:
-                        self.castles = 'q'
-                    else:
-                        return False
+            #castles can't capture, and the rook passes the b-file on the long castle
+            if not self.board.isEmpty(self.newpos) or (self.castles in 'Qq' and not self.board.isEmpty(Pos(self.pos.i, 1))):
+                return False
 
         #pawn capture/en passant
         if self.piece.role == 'p' and self.pos.fileDistance(self.newpos) == 1 and self.board.isEmpty(self.newpos) and not self.enpassant:
@@ -136,9 +131,14 @@ class Move:
         return True
 
     def leavesKingInCheck(self, col):
-        tmp = self.board.copy()
-        Move(tmp, self.pos, self.newpos, self.active).execute()
-        return tmp.inCheck(col)
+        self.board.make(self)
+        check = self.board.inCheck(col)
+        self.board.unmake()
+        return check
+
+    def uci(self):
+        """Returns the move in coordinate notation, e.g. e7e8q."""
+        return str(self.pos) + str(self.newpos) + self.promotion
 
     def __str__(self):
         algebraicNotation = ''
@@ -150,19 +150,19 @@ class Move:
         else:
             algebraicNotation += str(self.piece).upper()
         
-            #look for squares with pieces of the same kind, that could also do this move
-            ambiguousSquares = list(filter(lambda pos: self.board(pos).role == self.piece.role and Move(self.board, pos, self.newpos, self.active).isLegal(), self.board.squaresOfPlayer(self.active)))
+            #look for other pieces of the same kind that could also do this move: they attack the target and aren't pinned away from it
+            rivals = attacks(self.piece.role, self.active, self.newpos.sq, self.board.allOccupied) & self.board.bitboards[str(self.piece)] & ~(1 << self.pos.sq)
+            rivals = [SQUARES[sq] for sq in iterBits(rivals) if self.board.pinMask(SQUARES[sq], self.active) >> self.newpos.sq & 1]
 
-            if len(ambiguousSquares) == 2:
-                pos1, pos2 = ambiguousSquares
-                if pos1.isSameFile(pos2):
+            if rivals:
+                if not any(pos.isSameFile(self.pos) for pos in rivals):
+                    algebraicNotation += self.pos.file
+
+                elif not any(pos.isSameRank(self.pos) for pos in rivals):
                     algebraicNotation += str(self.pos.rank)
 
                 else:
-                    algebraicNotation += self.pos.file
-
-            elif len(ambiguousSquares) > 2:
-                algebraicNotation += str(self.pos)
+                    algebraicNotation += str(self.pos)
         
         algebraicNotation += self.capture + str(self.newpos)
         if self.promotion:
@@ -174,44 +174,11 @@ class Move:
         elif self.castles.lower() == 'q':
             algebraicNotation = 'O-O-O'
 
-        if self.leavesKingInCheck(self.piece.opcol):
+        if self.board.givesCheck(self):
             algebraicNotation += '+'
 
         return algebraicNotation
 
     def execute(self):
         #assuming self.isLegal() has been run before
-
-        if self.promotion:
-            self.board.movePiece(self.pos, self.newpos)
-            self.board(self.newpos).role = self.promotion
-            self.board(self.newpos).dir = None
-            return
-
-        elif self.enpassant:
-            self.board.setEmpty(Pos(self.pos.i, self.newpos.j))
-
-        elif self.castles:
-            if self.active == 'w':
-                self.board.castleRight['K'] = False
-                self.board.castleRight['Q'] = False
-            else:
-                self.board.castleRight['k'] = False
-                self.board.castleRight['q'] = False
-                
-            if self.castles == 'K':
-                self.board.movePiece(Pos(sqr='h1'), Pos(sqr='f1'))
-                
-            elif self.castles == 'Q':
-                self.board.movePiece(Pos(sqr='a1'), Pos(sqr='d1'))
-
-            elif self.castles == 'k':
-                self.board.movePiece(Pos(sqr='h8'), Pos(sqr='f8'))
-            
-            elif self.castles == 'q':
-                self.board.movePiece(Pos(sqr='a8'), Pos(sqr='d8'))
-
-        self.board.movePiece(self.pos, self.newpos)
-
-
-        
+        self.board.make(self)
@@ -0,0 +1,66 @@
+from pos import Pos
+from move import Move
+from bitboard import SQUARES
+
+#16 bit move codes: from square (bits 0-5), to square (bits 6-11), flags (bits 12-15)
+QUIET, DOUBLE_PUSH, KING_CASTLE, QUEEN_CASTLE, CAPTURE, ENPASSANT = 0, 1, 2, 3, 4, 5
+#promotions are 8 + piece, with the capture bit (4) set for capturing promotions
+PROMOTION = 8
+PROMOTION_ROLES = 'nbrq'
+
+#piece indices for compact undo records, 0 is no piece
+PIECE_CHARS = ' PNBRQKpnbrqk'
+
+def encodeMove(move):
+    """Packs a Move into 16 bits."""
+    if move is None:
+        return 0
+
+    flags = QUIET
+    if move.promotion:
+        flags = PROMOTION | PROMOTION_ROLES.index(move.promotion)
+        if move.capture:
+            flags |= CAPTURE
+    elif move.castles:
+        flags = KING_CASTLE if move.castles in 'Kk' else QUEEN_CASTLE
+    elif move.enpassant:
+        flags = ENPASSANT
+    elif move.capture:
+        flags = CAPTURE
+    elif move.piece.role == 'p' and move.pos.rankDistance(move.newpos) == 2:
+        flags = DOUBLE_PUSH
+
+    return move.pos.sq | move.newpos.sq << 6 | flags << 12
+
+def decodeMove(code):
+    """Returns (from square, to square, flags) of a move code."""
+    return (code & 63, code >> 6 & 63, code >> 12)
+
+def codePromotion(code):
+    """Returns the promotion piece of a move code, '' if there is none."""
+    flags = code >> 12
+    return PROMOTION_ROLES[flags & 3] if flags & PROMOTION else ''
+
+def codeKey(code):
+    """Returns (from square, to square, promotion) of a move code, comparable with search.moveKey()."""
+    return (code & 63, code >> 6 & 63, codePromotion(code))
+
+def codeToUci(code):
+    return str(SQUARES[code & 63]) + str(SQUARES[code >> 6 & 63]) + codePromotion(code)
+
+def moveFromCode(board, col, code):
+    """Builds the Move of a code for the current position of board."""
+    return Move(board, SQUARES[code & 63], SQUARES[code >> 6 & 63], col, promoteTo=codePromotion(code))
+
+def encodeUndo(captured, castleRight, enpassantPossible, halfmoveClock):
+    """Packs what a move destroys into 32 bits: captured piece, castle rights, en passant square and halfmove clock."""
+    rights = sum(1 << index for index, char in enumerate('KQkq') if castleRight[char])
+    enpassant = enpassantPossible.sq + 1 if enpassantPossible.isOnBoard() else 0
+    return PIECE_CHARS.index(str(captured) if captured else ' ') | rights << 4 | enpassant << 8 | min(halfmoveClock, 0xFFFF) << 15
+
+def decodeUndo(undo):
+    """Returns (captured piece char or '', castle rights dict, en passant Pos, halfmove clock) of an undo code."""
+    captured = PIECE_CHARS[undo & 15].strip()
+    castleRight = {char: bool(undo >> (4 + index) & 1) for index, char in enumerate('KQkq')}
+    enpassant = undo >> 8 & 127
+    return (captured, castleRight, SQUARES[enpassant - 1] if enpassant else Pos(sqr='-'), undo >> 15)
@@ -0,0 +1,138 @@
+from pos import Pos
+from move import Move
+from bitboard import FULL, squareIndex, squarePos, lsb, iterBits
+from attacks import KING_ATTACKS, ROOK_LINES, BISHOP_LINES, BETWEEN
+
+PROMOTION_ROLES = 'qrbn'
+
+#castle: (king target, squares that must be empty, squares the king passes or reaches that must not be attacked, rook square)
+CASTLES = {
+    'K': (6, (1 << 5 | 1 << 6), (5, 6), 7),
+    'Q': (2, (1 << 1 | 1 << 2 | 1 << 3), (3, 2), 0),
+    'k': (62, (1 << 61 | 1 << 62), (61, 62), 63),
+    'q': (58, (1 << 57 | 1 << 58 | 1 << 59), (59, 58), 56),
+}
+
+def checkersAndPins(board, col):
+    """Return the mask of pieces giving check to the king of col, and a dict mapping pinned squares to the line they may move on."""
+    opcol = 'b' if col == 'w' else 'w'
+    king = board.king(col)
+    ksq = king.sq
+    checkers = board.attackers(king, opcol)
+
+    if opcol == 'w':
+        rooks, bishops, queens = board.bitboards['R'], board.bitboards['B'], board.bitboards['Q']
+    else:
+        rooks, bishops, queens = board.bitboards['r'], board.bitboards['b'], board.bitboards['q']
+
+    pins = {}
+    snipers = (ROOK_LINES[ksq] & (rooks | queens)) | (BISHOP_LINES[ksq] & (bishops | queens))
+    for sniper in iterBits(snipers):
+        blockers = BETWEEN[ksq][sniper] & board.allOccupied
+        #exactly one piece in between, and it's ours
+        if blockers and not blockers & (blockers - 1) and blockers & board.occupied[col]:
+            pins[lsb(blockers)] = BETWEEN[ksq][sniper] | 1 << sniper
+
+    return checkers, pins
+
+def generateLegalMoves(board, col, pos=None):
+    """Yield the legal moves of col (only of the piece on pos, if given) without trying them on the board."""
+    opcol = 'b' if col == 'w' else 'w'
+    king = board.king(col)
+    ksq = king.sq
+    own = board.occupied[col]
+    checkers, pins = checkersAndPins(board, col)
+    onlySq = squareIndex(pos) if pos else None
+
+    #king moves, attacks are tested with the king removed so it can't hide behind itself on a line
+    if onlySq is None or onlySq == ksq:
+        occupied = board.allOccupied & ~(1 << ksq)
+        for newsq in iterBits(KING_ATTACKS[ksq] & ~own):
+            if not board.attackers(squarePos(newsq), opcol, occupied):
+                yield Move(board, king, squarePos(newsq), col)
+
+        if not checkers:
+            yield from generateCastles(board, col, king)
+
+    #in double check only the king may move
+    if checkers & (checkers - 1):
+        return
+
+    #a single check has to be captured or blocked
+    checkMask = checkers | BETWEEN[ksq][lsb(checkers)] if checkers else FULL
+
+    squares = own & ~(1 << ksq)
+    if onlySq is not None:
+        squares &= 1 << onlySq
+
+    for sq in iterBits(squares):
+        pos = squarePos(sq)
+        piece = board(pos)
+        targets = board.reachableMask(pos) & checkMask & pins.get(sq, FULL)
+
+        if piece.role == 'p':
+            #en passant captures the pawn beside, which may be the checker while the target square is not in checkMask
+            enpassant = board.enpassantMask() & board.reachableMask(pos) & pins.get(sq, FULL)
+            if enpassant:
+                targets &= ~enpassant
+                if isEnpassantLegal(board, col, sq, lsb(enpassant), checkMask):
+                    targets |= enpassant
+
+            for newsq in iterBits(targets):
+                if newsq >> 3 in (0, 7):
+                    for role in PROMOTION_ROLES:
+                        yield Move(board, pos, squarePos(newsq), col, promoteTo=role)
+                else:
+                    yield Move(board, pos, squarePos(newsq), col)
+
+        else:
+            for newsq in iterBits(targets):
+                yield Move(board, pos, squarePos(newsq), col)
+
+def isEnpassantLegal(board, col, sq, newsq, checkMask):
+    opcol = 'b' if col == 'w' else 'w'
+    capturedSq = (sq & ~7) | (newsq & 7)
+    #capturing a checking pawn or blocking a check
+    if not checkMask & (1 << capturedSq | 1 << newsq):
+        return False
+
+    #both pawns leave the rank of the king at once, which may uncover an attack on it
+    occupied = (board.allOccupied & ~(1 << sq) & ~(1 << capturedSq)) | 1 << newsq
+    return not board.attackers(board.king(col), opcol, occupied) & ~(1 << capturedSq)
+
+def generateCastles(board, col, king):
+    opcol = 'b' if col == 'w' else 'w'
+    if king.sq != (4 if col == 'w' else 60):
+        return
+
+    for castles in ('KQ' if col == 'w' else 'kq'):
+        if not board.castleRight[castles]:
+            continue
+
+        target, empty, passed, rookSq = CASTLES[castles]
+        if board.allOccupied & empty or not board.bitboards['R' if col == 'w' else 'r'] >> rookSq & 1:
+            continue
+
+        if any(board.isAttacked(squarePos(sq), opcol) for sq in passed):
+            continue
+
+        yield Move(board, king, squarePos(target), col)
+
+def legalMoves(board, col, pos=None):
+    return list(generateLegalMoves(board, col, pos))
+
+def findMove(board, col, uci):
+    """Return the legal move of col given in coordinate notation (e.g. e7e8q), or None."""
+    if len(uci) not in (4, 5) or uci[0] not in 'abcdefgh' or uci[1] not in '12345678':
+        return None
+
+    pos = Pos(sqr=uci[:2])
+    piece = board(pos)
+    if not piece or piece.col != col:
+        return None
+
+    for move in generateLegalMoves(board, col, pos):
+        if move.uci() == uci:
+            return move
+
+    return None
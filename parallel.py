@@ -0,0 +1,181 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from game import Game
+from movegen import findMove
+from search import Search, SearchResult, SearchAborted, isMateScore, INFINITY, MAX_PLY, DEFAULT_DEPTH
+from transposition import TranspositionTable
+
+#transposition table size of each worker process
+WORKER_TABLE_MB = 16
+
+#table of this worker process, kept between tasks
+workerTable = None
+
+def searchRootMove(fen, history, uci, depth, alpha, beta, deadline, nodes, tableMB):
+    """Worker task: search the position after one root move to a fixed depth with the root player's window (alpha, beta), until the deadline (wall clock time or None).
+    history are the position keys of the game before fen. Returns (uci, score, nodes, aborted, pv) from the root player's point of view, a score outside the window is only a bound."""
+    global workerTable
+    if workerTable is None or workerTable.sizeMB != tableMB:
+        workerTable = TranspositionTable(tableMB)
+
+    game = Game(fen)
+    board = game.board
+    movetime = max(deadline - time.time(), 0.0) if deadline is not None else None
+    search = Search(board, game.passive, depth, movetime, nodes, history=list(history) + [board.zobristKey], table=workerTable)
+    board.make(findMove(board, game.active, uci))
+    #searched one ply from the root, so mate scores and repetitions count as in the serial search
+    try:
+        score, pv = search.searchWindow(depth, -beta, -alpha, ply=1)
+    except SearchAborted:
+        return (uci, alpha, search.nodes, True, [uci])
+    finally:
+        board.unmake()
+
+    return (uci, -score, search.nodes, False, [uci] + [move.uci() for move in pv])
+
+def pvMoves(game, ucis):
+    """Turn a line in coordinate notation into Move objects, starting from the position of game."""
+    moves = []
+    col = game.active
+    for uci in ucis:
+        move = findMove(game.board, col, uci)
+        if not move:
+            break
+        moves.append(move)
+        game.board.make(move)
+        col = 'b' if col == 'w' else 'w'
+
+    for move in moves:
+        game.board.unmake()
+
+    return moves
+
+class ParallelSearch:
+    """Splits the root moves of a search across a pool of worker processes. The pool is kept until close()."""
+
+    def __init__(self, workers=None, tableMB=WORKER_TABLE_MB):
+        self.workers = workers if workers else (os.cpu_count() or 1)
+        self.tableMB = tableMB
+        self.executor = ProcessPoolExecutor(self.workers) if self.workers > 1 else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
+
+    def search(self, fen, depth=None, movetime=None, nodes=None, info=None, history=()):
+        """Same arguments and SearchResult as search.search(), history are the position keys of the game before fen (as for Search).
+
+        Principal variation splitting: each iteration searches the first root move with a full window, the others in parallel with a null window
+        on its score, and searches only the moves that fail high again. The workers keep their tables, so each iteration orders moves with the last one."""
+        if depth is None:
+            depth = DEFAULT_DEPTH if movetime is None and nodes is None else MAX_PLY
+
+        game = Game(fen)
+        rootMoves = game.legalMoves(game.active)
+        history = tuple(history)
+
+        #a single worker runs the serial search in this process, so its results are reproducible
+        if not self.executor or depth <= 1 or len(rootMoves) <= 1:
+            return Search(game.board, game.active, depth, movetime, nodes, info, history=history, table=TranspositionTable(self.tableMB)).run()
+
+        startTime = time.perf_counter()
+        order = [move.uci() for move in rootMoves]
+        totalNodes = 0
+        result = None
+
+        #iteration depth counts the root move, the workers search one ply less
+        for iterationDepth in range(2, min(depth, MAX_PLY - 1) + 1):
+            #tasks may wait in the queue, so workers get a wall clock deadline
+            deadline = None
+            if movetime is not None:
+                remainingTime = movetime - (time.perf_counter() - startTime)
+                if remainingTime <= 0 and result:
+                    break
+                deadline = time.time() + remainingTime
+
+            movesNodes = None
+            if nodes is not None:
+                if nodes - totalNodes <= 0 and result:
+                    break
+                movesNodes = max(1, (nodes - totalNodes) // len(order))
+
+            def searchMoves(ucis, alpha, beta):
+                futures = [self.executor.submit(searchRootMove, fen, history, uci, iterationDepth - 1, alpha, beta, deadline, movesNodes, self.tableMB) for uci in ucis]
+                return [future.result() for future in futures]
+
+            #the first move sets the score the others have to beat
+            results = searchMoves(order[:1], -INFINITY, INFINITY)
+            best = results[0]
+            failedHigh = []
+            if not best[3]:
+                alpha = best[1]
+                tried = searchMoves(order[1:], alpha, alpha + 1)
+                results += tried
+                failedHigh = [uci for uci, score, moveNodes, aborted, pv in tried if not aborted and score > alpha]
+                if failedHigh:
+                    #all moves that beat the first are searched again with the same window, the best of them wins
+                    researched = searchMoves(failedHigh, alpha, INFINITY)
+                    results += researched
+                    for moveResult in researched:
+                        if not moveResult[3] and moveResult[1] > best[1]:
+                            best = moveResult
+
+            totalNodes += sum(moveNodes for uci, score, moveNodes, aborted, pv in results)
+
+            #an interrupted iteration is only used if there is nothing else, bounds of an unfinished null window search say nothing
+            if any(aborted for uci, score, moveNodes, aborted, pv in results) and result:
+                result.aborted = True
+                break
+
+            uci, score, moveNodes, aborted, pv = best
+            pv = pvMoves(game, pv)
+            result = SearchResult(pv[0], score, iterationDepth, totalNodes, time.perf_counter() - startTime, pv)
+            if info:
+                info({'depth': iterationDepth, 'score': score, 'nodes': totalNodes, 'time': result.seconds, 'pv': result.uciPv()})
+
+            if isMateScore(score) and score > 0:
+                break
+
+            #next time the best move goes first, then the ones that came close
+            order = [uci] + [move for move in failedHigh if move != uci] + [move for move in order if move != uci and move not in failedHigh]
+
+        result.nodes = totalNodes
+        result.seconds = time.perf_counter() - startTime
+        return result
+
+    def searchGame(self, game, depth=None, movetime=None, nodes=None, info=None):
+        """Search the position of a Game, with its repetitions."""
+        return self.search(game.FEN(), depth, movetime, nodes, info, game.keyHistory[:-1])
+
+def parallelSearch(fen, workers=None, depth=None, movetime=None, nodes=None, info=None):
+    """Search a FEN with a temporary pool of worker processes."""
+    with ParallelSearch(workers) as pool:
+        return pool.search(fen, depth, movetime, nodes, info)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Search a position using several processes.')
+    parser.add_argument('fen', nargs='?', default='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='worker processes, defaults to the number of CPUs')
+    parser.add_argument('-d', '--depth', type=int, default=None, help='maximum search depth')
+    parser.add_argument('-t', '--movetime', type=float, default=None, help='time budget in seconds')
+    parser.add_argument('-n', '--nodes', type=int, default=None, help='node budget')
+    args = parser.parse_args(argv)
+
+    def info(data):
+        print(f"info depth {data['depth']} score {data['score']} nodes {data['nodes']} time {data['time']:.3f} pv {' '.join(data['pv'])}")
+
+    print(parallelSearch(args.fen, args.workers, args.depth, args.movetime, args.nodes, info))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
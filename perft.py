@@ -0,0 +1,124 @@
+import argparse
+import json
+import sys
+import time
+from game import Game
+
+#standard perft positions with their known node counts by depth
+REFERENCE_POSITIONS = [
+    ('initial', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', [20, 400, 8902, 197281, 4865609]),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', [48, 2039, 97862, 4085603]),
+    ('position3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', [14, 191, 2812, 43238, 674624]),
+    ('position4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1', [6, 264, 9467, 422333]),
+    ('position5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', [44, 1486, 62379, 2103487]),
+    ('position6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10', [46, 2079, 89890, 3894594]),
+]
+
+def perft(game, depth, col=None):
+    """Count the leaf nodes of the legal move tree of the given depth."""
+    if col is None:
+        col = game.active
+    if depth == 0:
+        return 1
+
+    moves = game.legalMoves(col)
+    if depth == 1:
+        return len(moves)
+
+    opcol = 'b' if col == 'w' else 'w'
+    nodes = 0
+    for move in moves:
+        move.execute()
+        nodes += perft(game, depth - 1, opcol)
+        game.board.unmake()
+
+    return nodes
+
+def divide(game, depth):
+    """Return the perft node count below each legal move, keyed by coordinate notation."""
+    opcol = 'b' if game.active == 'w' else 'w'
+    counts = {}
+    for move in game.legalMoves(game.active):
+        move.execute()
+        counts[move.uci()] = perft(game, depth - 1, opcol)
+        game.board.unmake()
+
+    return counts
+
+def run(fen, depth, showDivide=False):
+    """Run perft on a FEN and return a result dict with node count, time and nodes per second."""
+    game = Game(fen)
+    start = time.perf_counter()
+    if showDivide:
+        counts = divide(game, depth)
+        nodes = sum(counts.values())
+    else:
+        counts = None
+        nodes = perft(game, depth)
+    seconds = time.perf_counter() - start
+
+    return {
+        'fen': fen,
+        'depth': depth,
+        'nodes': nodes,
+        'seconds': seconds,
+        'nps': nodes / seconds if seconds else 0.0,
+        'divide': counts,
+    }
+
+def runSuite(maxDepth):
+    """Run all reference positions up to maxDepth and compare with the known counts."""
+    results = []
+    for name, fen, expected in REFERENCE_POSITIONS:
+        for depth in range(1, min(maxDepth, len(expected)) + 1):
+            result = run(fen, depth)
+            result['name'] = name
+            result['expected'] = expected[depth - 1]
+            result['ok'] = result['nodes'] == result['expected']
+            results.append(result)
+
+    return results
+
+def formatResult(result):
+    line = f"depth {result['depth']}: {result['nodes']} nodes in {result['seconds']:.3f}s ({result['nps']:,.0f} nps)"
+    if 'expected' in result:
+        status = 'ok' if result['ok'] else f"FAILED, expected {result['expected']}"
+        line = f"{result['name']:<10} {line} {status}"
+    return line
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Count move tree leaf nodes (perft) to verify and benchmark move generation.')
+    parser.add_argument('fen', nargs='?', default=REFERENCE_POSITIONS[0][1], help='position to analyse, defaults to the initial position')
+    parser.add_argument('-d', '--depth', type=int, default=3, help='search depth (maximum depth with --suite)')
+    parser.add_argument('--divide', action='store_true', help='print the node count below each root move')
+    parser.add_argument('--suite', action='store_true', help='run the reference positions and check their known counts')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args(argv)
+
+    if args.suite:
+        results = runSuite(args.depth)
+        total = sum(result['nodes'] for result in results)
+        seconds = sum(result['seconds'] for result in results)
+        if args.json:
+            print(json.dumps({'results': results, 'nodes': total, 'seconds': seconds}, indent=2))
+        else:
+            for result in results:
+                print(formatResult(result))
+            print(f'total: {total} nodes in {seconds:.3f}s ({total / seconds if seconds else 0:,.0f} nps)')
+
+        return 0 if all(result['ok'] for result in results) else 1
+
+    result = run(args.fen, args.depth, args.divide)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        if result['divide']:
+            for move, nodes in result['divide'].items():
+                print(f'{move}: {nodes}')
+            print()
+        print(formatResult(result))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import argparse
+import re
+import sys
+import time
+from game import Game
+from pos import Pos
+from bitboard import SQUARES, iterBits
+from attacks import attacks
+from movegen import generateLegalMoves
+
+INITIAL_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+TAG_RE = re.compile(r'^\[([A-Za-z0-9_]+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+#comments, variation brackets and everything else separated by white space
+TOKEN_RE = re.compile(r'\{[^}]*\}?|;[^\n]*|[()]|[^\s(){};]+')
+MOVE_NUMBER_RE = re.compile(r'^\d+\.*')
+SAN_RE = re.compile(r'^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?[+#]*[!?]*$')
+CASTLES_RE = re.compile(r'^([O0]-[O0](-[O0])?)[+#]*[!?]*$')
+
+class PgnGame:
+
+    def __init__(self, tags, sans, result):
+        self.tags = tags
+        self.sans = sans
+        self.result = result
+        #filled by replaying the moves
+        self.ucis = []
+        self.board = None
+        self.active = None
+        self.error = ''
+
+    def __str__(self):
+        return f"{self.tags.get('White', '?')} - {self.tags.get('Black', '?')} {self.result} ({len(self.sans)} plies)"
+
+def parseSan(board, col, san):
+    """Resolve a move in standard algebraic notation. Only the pieces that can reach the target square are looked at, found with the attack tables, and only their legal moves are accepted. ValueError if the move is illegal or ambiguous."""
+    castles = CASTLES_RE.match(san)
+    if castles:
+        rank = 0 if col == 'w' else 7
+        newpos = Pos(rank, 2 if castles.group(2) else 6)
+        moves = [move for move in generateLegalMoves(board, col, Pos(rank, 4)) if move.castles and move.newpos == newpos]
+        if not moves:
+            raise ValueError(f'Move {san} is illegal.')
+        return moves[0]
+
+    match = SAN_RE.match(san)
+    if not match:
+        raise ValueError(f'Not a move: {san}')
+
+    role, fromFile, fromRank, capture, target, promotion = match.groups()
+    newpos = Pos(sqr=target)
+    promoteTo = promotion.lower() if promotion else ''
+
+    if not role:
+        pawn = 'P' if col == 'w' else 'p'
+        back = -8 if col == 'w' else 8
+        if not 0 <= newpos.sq + back < 64:
+            #no pawn moves to its own back rank
+            candidates = []
+        elif fromFile:
+            #capture, the pawn comes from the rank behind the target
+            candidates = [newpos.sq + back - newpos.j + ord(fromFile) - 97]
+        else:
+            candidates = [newpos.sq + back]
+            if board.isEmpty(SQUARES[newpos.sq + back]) and newpos.i == (3 if col == 'w' else 4):
+                candidates = [newpos.sq + 2 * back]
+        candidates = [sq for sq in candidates if board.bitboards[pawn] >> sq & 1]
+
+    else:
+        char = role if col == 'w' else role.lower()
+        #pieces other than pawns attack each other's squares symmetrically
+        reaching = attacks(role.lower(), col, newpos.sq, board.allOccupied) & board.bitboards[char]
+        candidates = [sq for sq in iterBits(reaching)
+                      if (not fromFile or (sq & 7) == ord(fromFile) - 97) and (not fromRank or (sq >> 3) == int(fromRank) - 1)]
+
+    #the legal moves of the candidates that match the capture and promotion of the SAN, a pawn reaching the last rank has to name its promotion
+    moves = [move for sq in candidates for move in generateLegalMoves(board, col, SQUARES[sq])
+             if move.newpos == newpos and move.promotion == promoteTo and bool(move.capture) == bool(capture)]
+
+    if len(moves) != 1:
+        raise ValueError(f'Move {san} not found or ambiguous.')
+
+    return moves[0]
+
+def parseMovetext(text):
+    """Returns the SAN moves of the main line and the result."""
+    sans = []
+    result = '*'
+    variationDepth = 0
+    for token in TOKEN_RE.findall(text):
+        if token[0] in '{;$':
+            continue
+        elif token == '(':
+            variationDepth += 1
+            continue
+        elif token == ')':
+            variationDepth -= 1
+            continue
+        elif variationDepth:
+            continue
+
+        if token in RESULTS:
+            result = token
+            continue
+
+        token = MOVE_NUMBER_RE.sub('', token)
+        if token:
+            sans.append(token)
+
+    return sans, result
+
+def replay(pgnGame):
+    """Play the moves of a PgnGame on a board, filling in ucis, board and active, or error if a move can't be resolved."""
+    game = Game(pgnGame.tags.get('FEN', INITIAL_FEN))
+    board, col = game.board, game.active
+    for san in pgnGame.sans:
+        try:
+            move = parseSan(board, col, san)
+        except ValueError as error:
+            pgnGame.error = str(error)
+            break
+
+        pgnGame.ucis.append(move.uci())
+        board.make(move)
+        col = 'b' if col == 'w' else 'w'
+
+    #the game is read, nothing will be taken back
+    board.undoStack.clear()
+    pgnGame.board, pgnGame.active = board, col
+    return pgnGame
+
+def isCommentOpen(line, inComment):
+    """Is a {comment} still open at the end of the line? Comments don't nest."""
+    i = 0
+    while True:
+        i = line.find('}' if inComment else '{', i)
+        if i < 0:
+            return inComment
+        inComment = not inComment
+        i += 1
+
+def readGames(stream, resolve=True):
+    """Yields the games of a PGN text stream one at a time, only one game is held in memory."""
+    tags = {}
+    movetext = []
+    inComment = False
+
+    def finish():
+        sans, result = parseMovetext('\n'.join(movetext))
+        pgnGame = PgnGame(tags, sans, tags.get('Result', result) if result == '*' else result)
+        return replay(pgnGame) if resolve else pgnGame
+
+    for line in stream:
+        line = line.strip().lstrip('\ufeff')
+
+        #a tag after movetext starts the next game, unless it's inside a comment
+        if line.startswith('[') and not inComment:
+            if movetext:
+                yield finish()
+                tags, movetext = {}, []
+
+            match = TAG_RE.match(line)
+            if match:
+                tags[match.group(1)] = match.group(2).replace('\\"', '"').replace('\\\\', '\\')
+            continue
+
+        if line.startswith('%') or (not line and not movetext):
+            continue
+
+        if not line and not inComment:
+            yield finish()
+            tags, movetext = {}, []
+            continue
+
+        movetext.append(line)
+        inComment = isCommentOpen(line, inComment)
+
+    if movetext or tags:
+        yield finish()
+
+def readFile(path, resolve=True):
+    with open(path, encoding='utf-8', errors='replace') as stream:
+        yield from readGames(stream, resolve)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Read a PGN file and report games, plies and throughput.')
+    parser.add_argument('path')
+    parser.add_argument('--no-resolve', action='store_true', help='only parse, do not resolve the moves on a board')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print every game')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    games = plies = errors = 0
+    for pgnGame in readFile(args.path, not args.no_resolve):
+        games += 1
+        plies += len(pgnGame.sans)
+        if pgnGame.error:
+            errors += 1
+            print(f'game {games}: {pgnGame.error}', file=sys.stderr)
+        if args.verbose:
+            print(pgnGame)
+
+    seconds = time.perf_counter() - start
+    print(f'{games} games, {plies} plies, {errors} errors in {seconds:.2f}s ({games / seconds if seconds else 0:,.0f} games/s)')
+    return 0 if not errors else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
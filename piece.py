@@ -1,4 +1,5 @@
-from pos import Pos
+from bitboard import squareIndex, maskSquares
+from attacks import KING_ATTACKS, PAWN_ATTACKS, PAWN_PUSHES, CASTLE_TARGETS, LINES
 
 class Piece:
 
@@ -25,71 +26,38 @@ class Piece:
     
     def canMove(self, pos, newpos):
         #assuming the necessary conditions/board position, can the piece move that way?
+        sq, newsq = squareIndex(pos), squareIndex(newpos)
         if self.role == 'p':
-            #normal move / capture
-            if newpos.rank == pos.rank + self.dir and pos.isAdjacent(newpos):
-                return True
-            
-            #initial two square advance
-            elif newpos.rank == pos.rank + 2 * self.dir and pos.isSameFile(newpos):
-                if self.col == 'w' and pos.rank == 2:
-                    return True
-                
-                elif self.col == 'b' and pos.rank == 7:
-                    return True
-            
-            else:
-                return False
-        
-        elif self.role == 'n':
-            return pos.fileDistance(newpos) + pos.rankDistance(newpos) == 3 and pos.distance(newpos) == 2
-
-        elif self.role == 'r':
-            return pos.isSameFile(newpos) or pos.isSameRank(newpos)
-
-        elif self.role == 'b':
-            return pos.isSameDiag(newpos)
-
-        elif self.role == 'q':
-            return pos.isSameDiag(newpos) or pos.isSameFile(newpos) or pos.isSameRank(newpos)
+            #normal move / capture / initial two square advance
+            return bool((PAWN_PUSHES[self.col][sq] | PAWN_ATTACKS[self.col][sq]) >> newsq & 1)
 
         elif self.role == 'k':
-            if pos.isAdjacent(newpos):
-                return True
-            
-            #castles
-            elif pos.isSameRank(newpos) and pos.fileDistance(newpos) == 2:
-                return (self.col == 'w' and pos == Pos(sqr='e1')) or (self.col == 'b' and pos == Pos(sqr='e8'))
+            #including castles
+            return bool((KING_ATTACKS[sq] | CASTLE_TARGETS[self.col][sq]) >> newsq & 1)
+
+        elif self.role in LINES:
+            return bool(LINES[self.role][sq] >> newsq & 1)
 
         else:
             return False
 
     def isAttackingSquare(self, pos, newpos):
         if self.role == 'p':
-            return newpos.rank == pos.rank + self.dir and pos.fileDistance(newpos) == 1
+            return bool(PAWN_ATTACKS[self.col][squareIndex(pos)] >> squareIndex(newpos) & 1)
         
         else:
             return self.canMove(pos, newpos)
 
-    def squaresInReach(self, pos):
-        """Return list of squares the piece can reach."""
-        squares = []
+    def reach(self, sq):
+        """Return mask of squares the piece can reach from square index sq on an empty board."""
         if self.role == 'p':
-            squares = [pos + diff for diff in [Pos(self.dir, -1), Pos(self.dir, 0), Pos(self.dir, 1), Pos(2*self.dir, 0)]]
-
-        elif self.role == 'n':
-            squares = [pos + Pos(x, y) for x in [1, -1] for y in [2, -2]] + [pos + Pos(x, y) for y in [1, -1] for x in [2, -2]]
-
-        elif self.role == 'b':
-            squares = [Pos(i, pos.j - pos.i + i) for i in range(8)] + [Pos(i, pos.j + pos.i - i) for i in range(8)]
-
-        elif self.role == 'r':
-            squares = [Pos(pos.i, y) for y in range(8)] + [Pos(x, pos.j) for x in range(8)]
-
-        elif self.role == 'q':
-            squares = Piece('r', col='w').squaresInReach(pos) + Piece('b', col='w').squaresInReach(pos)
+            return PAWN_PUSHES[self.col][sq] | PAWN_ATTACKS[self.col][sq]
 
         elif self.role == 'k':
-            squares = [pos + Pos(x, y) for x in range(-1, 2) for y in range(-1, 2)] + [pos + Pos(0, 2), pos + Pos(0, -2)]
+            return KING_ATTACKS[sq] | CASTLE_TARGETS[self.col][sq]
 
-        return [sqr for sqr in squares if sqr.isOnBoard()]
\ No newline at end of file
+        return LINES[self.role][sq]
+
+    def squaresInReach(self, pos):
+        """Return list of squares the piece can reach."""
+        return maskSquares(self.reach(squareIndex(pos)))
@@ -43,6 +43,11 @@ class PlayGameLayout(QGridLayout):
         self.btnStartNew.clicked.connect(self.newGame)
         self.rightPanel.addWidget(self.btnStartNew)
 
+        self.btnBookMove = QPushButton('Play book move')
+        self.btnBookMove.clicked.connect(self.playBookMove)
+        self.btnBookMove.setEnabled(self.game.book is not None)
+        self.rightPanel.addWidget(self.btnBookMove)
+
         self.btnStartFromFen = QPushButton('Start game \n from this FEN')
         self.btnStartFromFen.clicked.connect(lambda x: self.newGame(self.fenText.toPlainText()))
         
@@ -54,15 +59,25 @@ class PlayGameLayout(QGridLayout):
         self.addLayout(self.fenLayout, 1, 0)
 
     def newGame(self, fen=''):
+        #the book stays with the new game
         if fen:
-            self.game = Game(fen)
+            self.game = Game(fen, book=self.game.book)
         else:
-            self.game = Game()
+            self.game = Game(book=self.game.book)
         
         self.board = BoardScene(self, self.game)
         self.boardView.setScene(self.board)
         self.updateGameInfo()
 
+    def playBookMove(self):
+        move = self.game.bookMove()
+        if not move:
+            QMessageBox.information(self.parentWidget(), 'Opening Book', 'This position is not in the book.')
+            return
+
+        self.board.makeMove(move)
+        self.board.setState('idle')
+
     def endGame(self):
         self.board.updateHighlights()
         self.updateGameInfo()
@@ -1,24 +1,44 @@
-import numpy as np
-
 class Pos:
+    #flyweight: the 64 squares and the '-' sentinel are built once, Pos(...) returns those objects
+    __slots__ = ('i', 'j', 'sq', 'rank', 'filenr', 'file')
 
-    def __init__(self, i=0, j=0, sqr=''):
-        #i, j matrix coordinates of position
-        self.i, self.j = i, j
+    def __new__(cls, i=0, j=0, sqr=''):
         if sqr:
             #handling fen input
             if sqr == '-':
-                self.i, self.j = -1, -1
-                return
+                return NOWHERE
 
             #converting algebraic square name to matrix coordinates
             sqr = sqr.upper()
-            self.i = int(sqr[1]) - 1
-            self.j = ord(sqr[0]) - 65
-        
-        self.rank = self.i + 1
-        self.filenr = self.j + 1
-        self.file = chr(self.j + 97)
+            i = int(sqr[1]) - 1
+            j = ord(sqr[0]) - 65
+
+        if 0 <= i < 8 and 0 <= j < 8:
+            return SQUARES[8 * i + j]
+
+        if i == -1 == j:
+            return NOWHERE
+
+        #off-board coordinates (e.g. step vectors) are not cached
+        return cls.build(i, j)
+
+    @classmethod
+    def build(cls, i, j):
+        pos = object.__new__(cls)
+        #i, j matrix coordinates of position
+        object.__setattr__(pos, 'i', i)
+        object.__setattr__(pos, 'j', j)
+        object.__setattr__(pos, 'sq', 8 * i + j)
+        object.__setattr__(pos, 'rank', i + 1)
+        object.__setattr__(pos, 'filenr', j + 1)
+        object.__setattr__(pos, 'file', chr(j + 97))
+        return pos
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Pos objects are immutable.')
+
+    def __reduce__(self):
+        return (Pos, (self.i, self.j))
 
     def __str__(self):
         if self.i == -1 == self.j:
@@ -26,8 +46,11 @@ class Pos:
         else:
             return self.file + str(self.rank)
 
+    def __repr__(self):
+        return f'Pos({str(self)})'
+
     def __eq__(self, other):
-        return self.i == other.i and self.j == other.j
+        return self is other or (isinstance(other, Pos) and self.i == other.i and self.j == other.j)
 
     def __add__(self, other):
         return Pos(self.i + other.i, self.j + other.j)
@@ -39,44 +62,51 @@ class Pos:
         return 0 <= self.i < 8 and 0 <= self.j < 8 
 
     def isSameFile(self, other):
-        return self.file == other.file
+        return self.j == other.j
     
     def isSameRank(self, other):
-        return self.rank == other.rank
+        return self.i == other.i
 
     def isSameDiag(self, other):
-        return abs(self.rank - other.rank) == abs(self.filenr - other.filenr)
+        return abs(self.i - other.i) == abs(self.j - other.j)
     
     def distance(self, other):
         """Induced by maximum norm."""
-        return max(abs(self.rank - other.rank), abs(self.filenr - other.filenr))
+        return max(abs(self.i - other.i), abs(self.j - other.j))
     
     def fileDistance(self, other):
-        return abs(self.filenr - other.filenr)
+        return abs(self.j - other.j)
 
     def rankDistance(self, other):
-        return abs(self.rank - other.rank)
+        return abs(self.i - other.i)
 
     def isAdjacent(self, other):
         return self.distance(other) <= 1
 
     def path(self, newpos):
-        """Returns list of passed squares (coords) for straight or diagonal moves in the order they're passed."""
-        #rank ~ row ~ x, file ~ column ~ y
-        x, X = self.i, newpos.i
-        y, Y = self.j, newpos.j
-        xdir, ydir = np.sign(X - x), np.sign(Y - y)
+        """Returns tuple of passed squares (coords) for straight or diagonal moves in the order they're passed."""
+        if self.isOnBoard() and newpos.isOnBoard():
+            path = PATHS[self.sq][newpos.sq]
+            if path:
+                return path
+
+        print('Squares not on one line.', self, newpos)
+
+def linePath(pos, newpos):
+    #rank ~ row ~ x, file ~ column ~ y
+    x, X = pos.i, newpos.i
+    y, Y = pos.j, newpos.j
+    xdir, ydir = (X > x) - (X < x), (Y > y) - (Y < y)
 
-        #straight
-        if xdir == 0 and ydir != 0:
-            return [Pos(x, b) for b in range(y, Y + ydir, ydir)]
+    #straight or diagonal
+    if (xdir == 0) != (ydir == 0) or abs(X - x) == abs(Y - y) > 0:
+        steps = max(abs(X - x), abs(Y - y))
+        return tuple(SQUARES[8 * (x + k * xdir) + y + k * ydir] for k in range(steps + 1))
 
-        elif xdir != 0 and ydir == 0:
-            return [Pos(a, y) for a in range(x, X + xdir, xdir)]
+    return ()
 
-        #diagonal
-        elif abs(X - x) == abs(Y - y) > 0:
-            #return list(zip(range(x, X + xdir, xdir), range(y, Y + ydir, ydir)))
-            return [Pos(a, b) for a, b in zip(range(x, X + xdir, xdir), range(y, Y + ydir, ydir))]
+SQUARES = tuple(Pos.build(sq >> 3, sq & 7) for sq in range(64))
+NOWHERE = Pos.build(-1, -1)
 
-        print('Squares not on one line.', self, newpos)
\ No newline at end of file
+#PATHS[sq][newsq] are the squares from sq to newsq (both included) if they are on one line, empty otherwise
+PATHS = tuple(tuple(linePath(pos, newpos) for newpos in SQUARES) for pos in SQUARES)
@@ -0,0 +1,353 @@
+import argparse
+import sys
+import time
+from game import Game
+from movegen import generateLegalMoves
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from moveCode import encodeMove, codeKey
+from evaluation import evaluate
+
+#piece values for ordering captures, positions are scored by evaluation.evaluate
+PIECE_VALUES = {'p': 100, 'n': 320, 'b': 330, 'r': 500, 'q': 900, 'k': 0}
+MATE_SCORE = 100000
+INFINITY = 10 * MATE_SCORE
+MAX_PLY = 128
+#score of a position the bitbases know is won, below the mate scores
+BITBASE_SCORE = MATE_SCORE // 10
+#bitbase.DRAW, bitbase is only imported when bitbases are used since it loads NumPy
+BITBASE_DRAW = 0
+#depth searched when no budget is given
+DEFAULT_DEPTH = 4
+
+#check the clock every this many nodes
+CHECK_INTERVAL = 1024
+#size of the table shared by searchGame() calls
+DEFAULT_TABLE_MB = 16
+sharedTable = None
+
+class SearchAborted(Exception):
+    pass
+
+def moveKey(move):
+    """Identifies a move independent of the Move object and board state it was created with."""
+    return (move.pos.sq, move.newpos.sq, move.promotion)
+
+def isMateScore(score):
+    return abs(score) > MATE_SCORE - MAX_PLY
+
+def scoreToTable(score, ply):
+    #mate scores are stored relative to the position, not to the root
+    if isMateScore(score):
+        return score + ply if score > 0 else score - ply
+    return score
+
+def scoreFromTable(score, ply):
+    if isMateScore(score):
+        return score - ply if score > 0 else score + ply
+    return score
+
+def getSharedTable():
+    global sharedTable
+    if sharedTable is None:
+        sharedTable = TranspositionTable(DEFAULT_TABLE_MB)
+    return sharedTable
+
+class SearchResult:
+
+    def __init__(self, bestMove, score, depth, nodes, seconds, pv):
+        self.bestMove = bestMove
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.seconds = seconds
+        self.pv = pv
+        #the last iteration was cut short by the budget, the result is the one of the iteration before
+        self.aborted = False
+
+    def uciPv(self):
+        return [move.uci() for move in self.pv]
+
+    def __str__(self):
+        return f'bestmove {self.bestMove.uci() if self.bestMove else "(none)"} score {self.score} depth {self.depth} nodes {self.nodes} pv {" ".join(self.uciPv())}'
+
+class Search:
+    """Negamax alpha-beta search with iterative deepening and quiescence search on a Board, using make/unmake."""
+
+    def __init__(self, board, col, maxDepth=MAX_PLY, movetime=None, nodes=None, info=None, history=(), table=None, bitbases=None):
+        self.board = board
+        self.col = col
+        self.maxDepth = min(maxDepth, MAX_PLY - 1)
+        #budgets, movetime in seconds
+        self.movetime = movetime
+        self.maxNodes = nodes
+        #called with a dict after each completed iteration
+        self.info = info
+        #TranspositionTable or None
+        self.table = table
+        #bitbase.Bitbases or None
+        self.bitbases = bitbases
+
+        self.nodes = 0
+        self.startTime = 0.0
+        #movetime counts from here, the start unless startClock() was called
+        self.clockStart = 0.0
+        self.stopRequested = False
+        self.currentDepth = 0
+
+        #two quiet moves per ply that caused a beta cutoff
+        self.killers = [[None, None] for ply in range(MAX_PLY)]
+        #triangular principal variation table
+        self.pvTable = [[] for ply in range(MAX_PLY + 1)]
+        self.rootPv = []
+
+        #keys of positions seen in the game and on the current search path, for repetition draws
+        self.keyCounts = {}
+        for key in history:
+            self.keyCounts[key] = self.keyCounts.get(key, 0) + 1
+
+    def stop(self):
+        """Ask a running search to return its best result so far."""
+        self.stopRequested = True
+
+    def elapsed(self):
+        return time.perf_counter() - self.startTime
+
+    def clockTime(self):
+        return time.perf_counter() - self.clockStart
+
+    def startClock(self, movetime):
+        """Give a running search a time budget of movetime seconds from now, e.g. when pondering turns into a normal search."""
+        self.clockStart = time.perf_counter()
+        self.movetime = movetime
+
+    def checkBudget(self):
+        #the first iteration always completes, so there is a move to return
+        if self.currentDepth <= 1:
+            return
+
+        if self.stopRequested or (self.maxNodes is not None and self.nodes >= self.maxNodes) or (self.movetime is not None and self.clockTime() >= self.movetime):
+            raise SearchAborted
+
+    def run(self):
+        self.startTime = self.clockStart = time.perf_counter()
+        rootUndoDepth = len(self.board.undoStack)
+        result = SearchResult(None, 0, 0, 0, 0.0, [])
+
+        rootMoves = list(generateLegalMoves(self.board, self.col))
+        if not rootMoves:
+            result.score = -MATE_SCORE if self.board.inCheck(self.col) else 0
+            return result
+
+        for depth in range(1, self.maxDepth + 1):
+            self.currentDepth = depth
+            try:
+                score = self.negamax(depth, -INFINITY, INFINITY, self.col, 0)
+            except SearchAborted:
+                #take back the moves of the interrupted line
+                while len(self.board.undoStack) > rootUndoDepth:
+                    self.board.unmake()
+                result.aborted = True
+                break
+
+            self.rootPv = list(self.pvTable[0])
+            result = SearchResult(self.rootPv[0] if self.rootPv else rootMoves[0], score, depth, self.nodes, self.elapsed(), self.rootPv)
+            if self.info:
+                self.info({'depth': depth, 'score': score, 'nodes': self.nodes, 'time': result.seconds, 'pv': result.uciPv()})
+
+            #no need to search deeper once a forced mate is found, or if there is only one move
+            if isMateScore(score) or len(rootMoves) == 1:
+                break
+
+            if self.stopRequested or (self.maxNodes is not None and self.nodes >= self.maxNodes):
+                break
+            if self.movetime is not None and self.clockTime() >= self.movetime / 2:
+                break
+
+        result.nodes = self.nodes
+        result.seconds = self.elapsed()
+        return result
+
+    def searchWindow(self, depth, alpha, beta, ply=0):
+        """One search to a fixed depth with an alpha-beta window, without iterative deepening. ply is the distance from the root of the whole search, so mate scores and repetitions count from there. Returns (score, pv), raises SearchAborted over budget."""
+        self.startTime = self.clockStart = time.perf_counter()
+        self.currentDepth = depth
+        undoDepth = len(self.board.undoStack)
+        try:
+            score = self.negamax(depth, alpha, beta, self.col, ply)
+        except SearchAborted:
+            while len(self.board.undoStack) > undoDepth:
+                self.board.unmake()
+            raise
+        return score, list(self.pvTable[ply])
+
+    def orderMoves(self, moves, ply, hashMove=None):
+        """Sorts moves: principal variation move, move from the transposition table, captures by MVV-LVA, killer moves, the rest."""
+        pvMove = self.rootPv[ply] if ply < len(self.rootPv) and self.isOnPv(ply) else None
+        pvKey = moveKey(pvMove) if pvMove else None
+        killers = [moveKey(move) for move in self.killers[ply] if move]
+
+        def priority(move):
+            key = moveKey(move)
+            if key == pvKey:
+                return 1000000
+            if key == hashMove:
+                return 500000
+            if move.capture:
+                victim = 'p' if move.enpassant else self.board(move.newpos).role
+                return 100000 + 10 * PIECE_VALUES[victim] - PIECE_VALUES[move.piece.role] + (PIECE_VALUES[move.promotion] if move.promotion else 0)
+            if move.promotion:
+                return 90000 + PIECE_VALUES[move.promotion]
+            if key in killers:
+                return 80000 - killers.index(key)
+            return 0
+
+        moves.sort(key=priority, reverse=True)
+        return moves
+
+    def isOnPv(self, ply):
+        #the moves made so far in the search follow the previous principal variation
+        undoStack = self.board.undoStack
+        path = undoStack[len(undoStack) - ply:] if ply else []
+        return all(moveKey(record[0]) == moveKey(pvMove) for record, pvMove in zip(path, self.rootPv))
+
+    def storeKiller(self, move, ply):
+        killers = self.killers[ply]
+        if not killers[0] or moveKey(killers[0]) != moveKey(move):
+            killers[1] = killers[0]
+            killers[0] = move
+
+    def negamax(self, depth, alpha, beta, col, ply):
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.checkBudget()
+
+        self.pvTable[ply] = []
+        board = self.board
+        key = board.zobristKey
+        if ply and self.keyCounts.get(key, 0):
+            return 0
+
+        #known endgames are resolved without searching, the evaluation still rewards progress in a won one
+        if ply and self.bitbases:
+            result = self.bitbases.probe(board)
+            if result is not None:
+                return 0 if result == BITBASE_DRAW else result * BITBASE_SCORE + self.evaluate(col)
+
+        hashMove = None
+        if self.table:
+            entry = self.table.probe(key)
+            if entry:
+                entryDepth, bound, score, code = entry
+                hashMove = codeKey(code) if code else None
+                if ply and entryDepth >= depth:
+                    score = scoreFromTable(score, ply)
+                    if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                        return score
+
+        inCheck = board.inCheck(col)
+        if inCheck:
+            depth += 1
+
+        if depth <= 0 or ply >= MAX_PLY - 1:
+            return self.quiescence(alpha, beta, col, ply)
+
+        moves = list(generateLegalMoves(board, col))
+        if not moves:
+            return -MATE_SCORE + ply if inCheck else 0
+
+        opcol = 'b' if col == 'w' else 'w'
+        best = -INFINITY
+        bestMove = None
+        alphaOrig = alpha
+        self.keyCounts[key] = self.keyCounts.get(key, 0) + 1
+        for move in self.orderMoves(moves, ply, hashMove):
+            board.make(move)
+            score = -self.negamax(depth - 1, -beta, -alpha, opcol, ply + 1)
+            board.unmake()
+
+            if score > best:
+                best = score
+                bestMove = move
+                if score > alpha:
+                    alpha = score
+                    self.pvTable[ply] = [move] + self.pvTable[ply + 1]
+
+            if alpha >= beta:
+                if not move.capture and not move.promotion:
+                    self.storeKiller(move, ply)
+                break
+        self.keyCounts[key] -= 1
+
+        if self.table:
+            bound = UPPER if best <= alphaOrig else LOWER if best >= beta else EXACT
+            self.table.store(key, depth, bound, scoreToTable(best, ply), encodeMove(bestMove))
+
+        return best
+
+    def quiescence(self, alpha, beta, col, ply):
+        """Only captures and promotions are searched, until the position is quiet."""
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.checkBudget()
+
+        self.pvTable[ply] = []
+        standPat = self.evaluate(col)
+        if standPat >= beta or ply >= MAX_PLY - 1:
+            return standPat
+        alpha = max(alpha, standPat)
+
+        board = self.board
+        opcol = 'b' if col == 'w' else 'w'
+        moves = [move for move in generateLegalMoves(board, col) if move.capture or move.promotion]
+        for move in self.orderMoves(moves, ply):
+            board.make(move)
+            score = -self.quiescence(-beta, -alpha, opcol, ply + 1)
+            board.unmake()
+
+            if score > alpha:
+                alpha = score
+                self.pvTable[ply] = [move] + self.pvTable[ply + 1]
+                if alpha >= beta:
+                    break
+
+        return alpha
+
+    def evaluate(self, col):
+        return evaluate(self.board, col)
+
+def searchGame(game, depth=None, movetime=None, nodes=None, info=None, table=None, bitbases=None):
+    """Search the position of a Game for its active player. Uses a transposition table shared between calls unless one is given."""
+    if depth is None:
+        depth = DEFAULT_DEPTH if movetime is None and nodes is None else MAX_PLY
+    if table is None:
+        table = getSharedTable()
+    return Search(game.board, game.active, depth, movetime, nodes, info, history=game.keyHistory[:-1], table=table, bitbases=bitbases).run()
+
+def search(fen, depth=None, movetime=None, nodes=None, info=None, table=None, bitbases=None):
+    """Search a FEN position, returns a SearchResult with best move, score (centipawns for the side to move) and principal variation."""
+    return searchGame(Game(fen), depth, movetime, nodes, info, table, bitbases)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Search a position for the best move.')
+    parser.add_argument('fen', nargs='?', default='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+    parser.add_argument('-d', '--depth', type=int, default=None, help='maximum search depth')
+    parser.add_argument('-t', '--movetime', type=float, default=None, help='time budget in seconds')
+    parser.add_argument('-n', '--nodes', type=int, default=None, help='node budget')
+    parser.add_argument('--hash', type=int, default=DEFAULT_TABLE_MB, help='transposition table size in MB')
+    parser.add_argument('--bitbases', default=None, help='directory of endgame bitbases to probe')
+    args = parser.parse_args(argv)
+
+    def info(data):
+        print(f"info depth {data['depth']} score {data['score']} nodes {data['nodes']} time {data['time']:.3f} pv {' '.join(data['pv'])}")
+
+    bitbases = None
+    if args.bitbases:
+        from bitbase import Bitbases
+        bitbases = Bitbases(args.bitbases)
+
+    result = search(args.fen, args.depth, args.movetime, args.nodes, info, TranspositionTable(args.hash), bitbases)
+    print(result)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
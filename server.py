@@ -0,0 +1,195 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from game import Game, loadGame
+from movegen import findMove
+from search import Search, getSharedTable, DEFAULT_DEPTH, MAX_PLY
+
+INITIAL_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+#a search request may not ask for more than this
+MAX_SEARCH_DEPTH = 64
+MAX_MOVETIME = 60.0
+#node limit of a search without a time limit, so it can't hold a worker forever
+MAX_SEARCH_NODES = 1000000
+
+def searchPosition(fen, history, depth, movetime, nodes):
+    """Worker task: search the current position of a game, history are the position keys before it for repetitions. Returns a response dict."""
+    game = Game(fen, lazySan=True)
+    if depth is None:
+        depth = DEFAULT_DEPTH if movetime is None and nodes is None else MAX_PLY
+
+    result = Search(game.board, game.active, depth, movetime, nodes, history=history, table=getSharedTable()).run()
+    return {
+        'bestmove': result.bestMove.uci() if result.bestMove else None,
+        'score': result.score,
+        'depth': result.depth,
+        'nodes': result.nodes,
+        'pv': result.uciPv(),
+    }
+
+class ServerGame:
+
+    def __init__(self, fen):
+        self.game = loadGame(fen, lazySan=True)
+        #Game isn't thread safe, requests on the same game run one at a time
+        self.lock = asyncio.Lock()
+
+    def state(self):
+        game = self.game
+        return {
+            'fen': game.FEN(),
+            'active': game.active,
+            'status': game.status(game.active),
+            'score': list(game.pgnDict['score']),
+            'plies': len(game.moveHistory),
+        }
+
+    def legalMoves(self):
+        return [move.uci() for move in self.game.legalMoves(self.game.active)]
+
+    def play(self, uci):
+        move = findMove(self.game.board, self.game.active, uci)
+        if not move:
+            raise ValueError(f'Illegal move: {uci}')
+        self.game.turn(move)
+        return self.state()
+
+    def undo(self):
+        self.game.undo()
+        return self.state()
+
+class GameServer:
+    """Hosts Games keyed by id and answers JSON-lines requests. Work on a game runs in a thread pool, searches in a process pool, so the event loop only parses and routes.
+
+    The threads only keep the loop free: move generation is pure Python, so legal move and move requests of different games still take turns on the GIL. Searches, the only long requests, don't."""
+
+    def __init__(self, workers=None, threads=None):
+        self.games = {}
+        self.ids = itertools.count(1)
+        self.threads = ThreadPoolExecutor(threads)
+        self.processes = ProcessPoolExecutor(workers or os.cpu_count() or 1)
+
+    def close(self):
+        self.threads.shutdown()
+        self.processes.shutdown()
+
+    def getGame(self, request):
+        gameId = str(request.get('game', ''))
+        if gameId not in self.games:
+            raise KeyError(f'No game {gameId}')
+        return gameId, self.games[gameId]
+
+    async def inThread(self, serverGame, function, *args):
+        async with serverGame.lock:
+            return await asyncio.get_running_loop().run_in_executor(self.threads, function, *args)
+
+    async def handle(self, request):
+        """Answer one request dict. Operations: new, state, legal, move, undo, pgn, search, close, list."""
+        op = request.get('op')
+        if op == 'new':
+            #only a valid game gets an id
+            serverGame = ServerGame(str(request.get('fen', INITIAL_FEN)))
+            gameId = str(next(self.ids))
+            self.games[gameId] = serverGame
+            return {'game': gameId, **await self.inThread(serverGame, serverGame.state)}
+
+        if op == 'list':
+            return {'games': list(self.games)}
+
+        gameId, serverGame = self.getGame(request)
+        if op == 'state':
+            return {'game': gameId, **await self.inThread(serverGame, serverGame.state)}
+        if op == 'legal':
+            return {'game': gameId, 'moves': await self.inThread(serverGame, serverGame.legalMoves)}
+        if op == 'move':
+            return {'game': gameId, **await self.inThread(serverGame, serverGame.play, request['move'])}
+        if op == 'undo':
+            return {'game': gameId, **await self.inThread(serverGame, serverGame.undo)}
+        if op == 'pgn':
+            return {'game': gameId, 'pgn': await self.inThread(serverGame, serverGame.game.PGN)}
+        if op == 'close':
+            del self.games[gameId]
+            return {'game': gameId}
+        if op == 'search':
+            async with serverGame.lock:
+                game = serverGame.game
+                #the current position and its repetition keys, the worker doesn't replay the game
+                fen, history = game.FEN(), game.keyHistory[:-1]
+            depth = min(request['depth'], MAX_SEARCH_DEPTH) if 'depth' in request else None
+            movetime = min(request['movetime'], MAX_MOVETIME) if 'movetime' in request else None
+            nodes = request.get('nodes')
+            if depth is None and movetime is None and nodes is None:
+                depth = 4
+            if movetime is None:
+                nodes = min(nodes, MAX_SEARCH_NODES) if nodes is not None else MAX_SEARCH_NODES
+                depth = depth if depth is not None else MAX_SEARCH_DEPTH
+            result = await asyncio.get_running_loop().run_in_executor(self.processes, searchPosition, fen, history, depth, movetime, nodes)
+            return {'game': gameId, **result}
+
+        raise ValueError(f'Unknown operation: {op}')
+
+    async def respond(self, line, writer):
+        try:
+            request = json.loads(line)
+        except ValueError as error:
+            response = {'ok': False, 'error': f'Invalid JSON: {error}'}
+        else:
+            requestId = request.get('id') if isinstance(request, dict) else None
+            try:
+                if not isinstance(request, dict):
+                    raise ValueError('A request must be a JSON object')
+                response = {'id': requestId, 'ok': True, **await self.handle(request)}
+            except Exception as error:
+                #any failure is answered, the connection keeps going
+                response = {'id': requestId, 'ok': False, 'error': str(error).strip("'")}
+
+        writer.write(json.dumps(response).encode() + b'\n')
+        await writer.drain()
+
+    async def connection(self, reader, writer):
+        """Requests of a connection are answered as they finish, responses carry the request id."""
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.create_task(self.respond(line, writer))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            writer.close()
+
+async def serve(host='127.0.0.1', port=8765, unixPath=None, workers=None):
+    gameServer = GameServer(workers)
+    if unixPath:
+        server = await asyncio.start_unix_server(gameServer.connection, unixPath)
+    else:
+        server = await asyncio.start_server(gameServer.connection, host, port)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        gameServer.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve games over JSON lines, one request object per line.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', default=None, help='listen on this Unix socket path instead of TCP')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='search processes, defaults to the number of CPUs')
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
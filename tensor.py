@@ -0,0 +1,143 @@
+import argparse
+import re
+import sys
+import time
+import numpy as np
+
+#plane order of the piece planes, plane[rank][file] is 1 if the piece stands there
+PLANE_CHARS = 'PNBRQKpnbrqk'
+PLANE_CODES = np.frombuffer(PLANE_CHARS.encode('ascii'), np.uint8)
+CASTLE_CHARS = 'KQkq'
+EMPTY = ord('1')
+
+#expands the digits of a FEN placement to that many empty squares and drops the rank separators
+EXPAND_FEN = str.maketrans({**{str(n): '1' * n for n in range(1, 9)}, '/': ''})
+EMPTY_RUN_RE = re.compile('1+')
+
+class PositionBatch:
+    """Preallocated arrays of N positions: piece planes (N, 12, 8, 8), side to move, castle rights (KQkq), en passant square (-1 if none) and clocks."""
+
+    def __init__(self, size):
+        self.size = size
+        self.planes = np.zeros((size, 12, 8, 8), np.uint8)
+        #1 if white is to move
+        self.active = np.zeros(size, np.uint8)
+        self.castling = np.zeros((size, 4), np.uint8)
+        self.enpassant = np.full(size, -1, np.int8)
+        #halfmove clock and fullmove number
+        self.clocks = np.zeros((size, 2), np.uint16)
+
+    def __len__(self):
+        return self.size
+
+    def fill(self, positions, start=0):
+        """Encode FEN strings or Boards into the rows from start on. Returns the number of rows written."""
+        positions = list(positions)
+        if positions and isinstance(positions[0], str):
+            return self.fillFens(positions, start)
+        return self.fillBoards(positions, start)
+
+    def fillFens(self, fens, start=0):
+        fields = [fen.split() for fen in fens]
+        n = len(fields)
+        stop = start + n
+
+        #one 64 character string per position, rank 8 first, turned into plane bits by comparing with every piece letter at once
+        placement = ''.join(field[0].translate(EXPAND_FEN) for field in fields).encode('ascii')
+        if len(placement) != 64 * n:
+            raise ValueError('Invalid FEN piece placement in batch.')
+        chars = np.frombuffer(placement, np.uint8).reshape(n, 8, 8)[:, ::-1]
+        np.equal(chars[:, None], PLANE_CODES[None, :, None, None], out=self.planes[start:stop].view(bool))
+
+        self.active[start:stop] = [field[1] == 'w' for field in fields]
+        self.castling[start:stop] = [[char in field[2] for char in CASTLE_CHARS] for field in fields]
+        self.enpassant[start:stop] = [8 * (int(field[3][1]) - 1) + ord(field[3][0]) - 97 if field[3] != '-' else -1 for field in fields]
+        self.clocks[start:stop] = [(int(field[4]), int(field[5])) if len(field) > 5 else (0, 1) for field in fields]
+        return n
+
+    def fillBoards(self, boards, start=0):
+        n = len(boards)
+        stop = start + n
+
+        masks = np.array([[board.bitboards[char] for char in PLANE_CHARS] for board in boards], np.uint64).reshape(n, 12)
+        self.planes[start:stop] = masksToPlanes(masks)
+
+        self.active[start:stop] = [board.active == 'w' for board in boards]
+        self.castling[start:stop] = [[board.castleRight[char] for char in CASTLE_CHARS] for board in boards]
+        self.enpassant[start:stop] = [board.enpassantPossible.sq if board.enpassantPossible.isOnBoard() else -1 for board in boards]
+        #a Board doesn't know the clocks, they are kept by Game
+        self.clocks[start:stop] = (0, 1)
+        return n
+
+    def masks(self):
+        """The piece planes as (N, 12) uint64 bitboards, square 8 * rank + file."""
+        return planesToMasks(self.planes)
+
+    def fens(self):
+        """Decode the batch back to FEN strings."""
+        flat = self.planes.reshape(self.size, 12, 64)
+        #piece letter of every square, '1' where all planes are empty
+        chars = np.where(flat.any(axis=1), PLANE_CODES[flat.argmax(axis=1)], EMPTY).astype(np.uint8)
+        chars = chars.reshape(self.size, 8, 8)[:, ::-1].tobytes().decode('ascii')
+
+        fens = []
+        for index in range(self.size):
+            ranks = chars[64 * index:64 * index + 64]
+            placement = '/'.join(EMPTY_RUN_RE.sub(lambda match: str(len(match.group())), ranks[8 * i:8 * i + 8]) for i in range(8))
+            castling = ''.join(char for char, right in zip(CASTLE_CHARS, self.castling[index]) if right) or '-'
+            sq = int(self.enpassant[index])
+            enpassant = 'abcdefgh'[sq & 7] + str((sq >> 3) + 1) if sq >= 0 else '-'
+            halfmoves, fullmove = self.clocks[index]
+            fens.append(f"{placement} {'w' if self.active[index] else 'b'} {castling} {enpassant} {halfmoves} {fullmove}")
+
+        return fens
+
+def masksToPlanes(masks):
+    """(..., 64 bit masks) to (..., 8, 8) uint8 planes, without a loop over squares."""
+    masks = np.ascontiguousarray(masks, '<u8')
+    bits = np.unpackbits(masks.view(np.uint8).reshape(masks.shape + (8,)), axis=-1, bitorder='little')
+    return bits.reshape(masks.shape + (8, 8))
+
+def planesToMasks(planes):
+    """(..., 8, 8) planes to (...) uint64 masks."""
+    planes = np.asarray(planes)
+    packed = np.packbits(planes.reshape(planes.shape[:-2] + (64,)).astype(bool), axis=-1, bitorder='little')
+    return np.ascontiguousarray(packed).view('<u8').reshape(planes.shape[:-2]).astype(np.uint64)
+
+def encode(positions, batch=None, start=0):
+    """Encode FEN strings or Boards into a PositionBatch, a new one unless batch is given."""
+    positions = list(positions)
+    if batch is None:
+        batch = PositionBatch(len(positions))
+    batch.fill(positions, start)
+    return batch
+
+def decode(batch):
+    return batch.fens()
+
+def lineFen(line):
+    """The FEN of a FEN or EPD line, EPD lines have no clocks but operations after the fourth field."""
+    fields = line.split()
+    clocks = fields[4:6] if len(fields) > 5 and fields[4].isdigit() and fields[5].isdigit() else ['0', '1']
+    return ' '.join(fields[:4] + clocks)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Encode the FENs of a file (one per line, EPD operations are ignored) into plane tensors.')
+    parser.add_argument('path')
+    parser.add_argument('-o', '--out', default=None, help='write the arrays to this .npz file')
+    args = parser.parse_args(argv)
+
+    with open(args.path, encoding='utf-8') as stream:
+        fens = [lineFen(line) for line in stream if line.strip()]
+
+    start = time.perf_counter()
+    batch = encode(fens)
+    seconds = time.perf_counter() - start
+    print(f'{len(batch)} positions in {seconds:.3f}s ({len(batch) / seconds if seconds else 0:,.0f} positions/s)')
+
+    if args.out:
+        np.savez(args.out, planes=batch.planes, active=batch.active, castling=batch.castling, enpassant=batch.enpassant, clocks=batch.clocks)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
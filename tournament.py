@@ -0,0 +1,256 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from game import Game
+from epd import readEpd
+from search import Search
+from transposition import TranspositionTable
+
+#balanced positions after two moves each, every one is played with both colors
+OPENINGS = [
+    'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3',
+    'rnbqkbnr/pp2pppp/3p4/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 0 3',
+    'rnbqkbnr/ppp2ppp/4p3/3p4/2PP4/8/PP2PPPP/RNBQKBNR w KQkq - 0 3',
+    'rnbqkb1r/pppppp1p/5np1/8/2PP4/8/PP2PPPP/RNBQKBNR w KQkq - 0 3',
+    'rnbqkbnr/ppp2ppp/4p3/3p4/3PP3/8/PPP2PPP/RNBQKBNR w KQkq - 0 3',
+    'rnbqkbnr/pp2pppp/2p5/3p4/3PP3/8/PPP2PPP/RNBQKBNR w KQkq - 0 3',
+    'rnbqkb1r/pppp1ppp/5n2/4p3/2P5/2N5/PP1PPPPP/R1BQKBNR w KQkq - 2 3',
+    'rnbqkb1r/ppp1pppp/5n2/3p4/8/5NP1/PPPPPP1P/RNBQKB1R w KQkq - 1 3',
+    'rnbqkb1r/pppp1ppp/5n2/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3',
+    'rnbqkb1r/ppp1pppp/5n2/3p4/3P1B2/8/PPP1PPPP/RN1QKBNR w KQkq - 2 3',
+]
+
+#games still running after this many plies are drawn
+MAX_PLIES = 300
+RESULTS = {(1, 0): '1-0', (0, 1): '0-1', (0.5, 0.5): '1/2-1/2'}
+#added to each of wins, draws and losses by sprt()
+SPRT_PSEUDO_COUNT = 0.5
+
+#tables of this worker process for the white and the black engine, kept between games. Not by name, self-play engines share it
+workerTables = {}
+
+def parseEngine(text):
+    """Engine from 'name:depth=3,movetime=0.1,nodes=5000,hash=16'. The budget applies to every move."""
+    name, _, options = text.partition(':')
+    engine = {'name': name, 'depth': None, 'movetime': None, 'nodes': None, 'hash': 16}
+    for option in filter(None, options.split(',')):
+        key, _, value = option.partition('=')
+        if key not in engine or key == 'name':
+            raise ValueError(f'Unknown engine option: {key}')
+        engine[key] = float(value) if key == 'movetime' else int(value)
+
+    if engine['depth'] is None and engine['movetime'] is None and engine['nodes'] is None:
+        engine['depth'] = 3
+    return engine
+
+def playGame(fen, white, black, roundNumber, maxPlies=MAX_PLIES):
+    """Worker task: play one game between two engines. Returns a dict with the result, the PGN text and statistics."""
+    game = Game(fen, lazySan=True)
+    engines = {'w': white, 'b': black}
+    for col, engine in engines.items():
+        table = workerTables.get(col)
+        if table is None or table.sizeMB != engine['hash']:
+            table = workerTables[col] = TranspositionTable(engine['hash'])
+        #games don't depend on which worker played what before
+        table.clear()
+
+    start = time.perf_counter()
+    nodes = {'w': 0, 'b': 0}
+    adjudication = ''
+    while not game.pgnDict['score']:
+        if len(game.moveHistory) >= maxPlies:
+            game.pgnDict['score'] = (0.5, 0.5)
+            adjudication = 'max plies'
+            break
+
+        engine = engines[game.active]
+        result = Search(game.board, game.active, engine['depth'] or 128, engine['movetime'], engine['nodes'],
+                        history=game.keyHistory[:-1], table=workerTables[game.active]).run()
+        if not result.bestMove:
+            #the start position was already over
+            game.pgnDict['score'] = (0.5, 0.5) if not game.board.inCheck(game.active) else ((0, 1) if game.active == 'w' else (1, 0))
+            break
+        nodes[game.active] += result.nodes
+        game.turn(result.bestMove)
+
+    score = tuple(game.pgnDict['score'])
+    if not adjudication:
+        adjudication = game.status(game.active) or ('repetition' if game.isRepetition(3) else '50 moves')
+
+    tags = [('Event', 'Tournament'), ('Round', str(roundNumber)), ('White', white['name']), ('Black', black['name']),
+            ('Result', RESULTS[score]), ('FEN', fen), ('SetUp', '1'), ('Termination', adjudication)]
+    #PGN() ends with the score, the result tag's notation is used instead
+    movetext = game.PGN().rsplit(' ', 1)[0].replace('1. ... ', '1... ')
+    pgn = '\n'.join(f'[{tag} "{value}"]' for tag, value in tags) + f'\n\n{movetext} {RESULTS[score]}\n'
+
+    return {
+        'round': roundNumber,
+        'white': white['name'],
+        'black': black['name'],
+        'result': RESULTS[score],
+        'score': score[0],
+        'termination': adjudication,
+        'plies': len(game.moveHistory),
+        'nodes': nodes['w'] + nodes['b'],
+        'seconds': time.perf_counter() - start,
+        'pgn': pgn,
+    }
+
+def eloFromScore(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+def eloStats(wins, draws, losses):
+    """Elo difference and its 95% confidence interval from a win/draw/loss count."""
+    games = wins + draws + losses
+    if not games:
+        return 0.0, 0.0, 0.0
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    return eloFromScore(score), eloFromScore(score - margin), eloFromScore(score + margin)
+
+def sprt(wins, draws, losses, elo0=0.0, elo1=5.0, alpha=0.05, beta=0.05):
+    """Sequential probability ratio test of elo1 against elo0. Returns (log likelihood ratio, lower bound, upper bound, 'H0', 'H1' or '')."""
+    lower, upper = math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+    if not wins + draws + losses:
+        return 0.0, lower, upper, ''
+
+    #half a game of each result keeps the variance above zero when one result hasn't happened yet
+    wins, draws, losses = wins + SPRT_PSEUDO_COUNT, draws + SPRT_PSEUDO_COUNT, losses + SPRT_PSEUDO_COUNT
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    variance = (wins + draws / 4) / games - score ** 2
+    score0 = 1 / (1 + 10 ** (-elo0 / 400))
+    score1 = 1 / (1 + 10 ** (-elo1 / 400))
+    llr = (score1 - score0) * (2 * score - score0 - score1) / (2 * variance / games) if variance > 0 else 0.0
+
+    decision = 'H1' if llr >= upper else 'H0' if llr <= lower else ''
+    return llr, lower, upper, decision
+
+class Tournament:
+    """Plays engine A against engine B from a set of openings, each with both colors, on a pool of worker processes."""
+
+    def __init__(self, engineA, engineB, openings=OPENINGS, rounds=1, workers=None, pgnPath=None, elo0=0.0, elo1=5.0, maxPlies=MAX_PLIES):
+        self.engines = (engineA, engineB)
+        self.openings = openings
+        self.rounds = rounds
+        self.workers = workers if workers else (os.cpu_count() or 1)
+        self.pgnPath = pgnPath
+        self.sprtBounds = (elo0, elo1)
+        self.maxPlies = maxPlies
+        #results from the point of view of engine A
+        self.wins = self.draws = self.losses = 0
+        self.results = []
+
+    def pairings(self):
+        """(fen, white, black, game number, index of the white engine) of every game. Engines are told apart by index, their names may be the same."""
+        number = 0
+        for repeat in range(self.rounds):
+            for fen in self.openings:
+                for whiteIndex in (0, 1):
+                    number += 1
+                    yield (fen, self.engines[whiteIndex], self.engines[1 - whiteIndex], number, whiteIndex)
+
+    def record(self, result, whiteIndex):
+        self.results.append(result)
+        scoreA = result['score'] if whiteIndex == 0 else 1 - result['score']
+        if scoreA == 1:
+            self.wins += 1
+        elif scoreA == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def run(self, info=None, stopOnSprt=False):
+        """Play all pairings, streaming each finished game to the PGN file. Returns the report dict."""
+        start = time.perf_counter()
+        pgnFile = open(self.pgnPath, 'a', encoding='utf-8') if self.pgnPath else None
+        try:
+            with ProcessPoolExecutor(self.workers) as executor:
+                #future: index of the white engine
+                futures = {executor.submit(playGame, fen, white, black, number, self.maxPlies): whiteIndex for fen, white, black, number, whiteIndex in self.pairings()}
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+                    result = future.result()
+                    self.record(result, futures[future])
+                    if pgnFile:
+                        pgnFile.write(result['pgn'] + '\n')
+                        pgnFile.flush()
+                    if info:
+                        info(result, self)
+
+                    if stopOnSprt and sprt(self.wins, self.draws, self.losses, *self.sprtBounds)[3]:
+                        #games already running finish, the rest is dropped
+                        for pending in futures:
+                            pending.cancel()
+                        break
+        finally:
+            if pgnFile:
+                pgnFile.close()
+
+        return self.report(time.perf_counter() - start)
+
+    def report(self, seconds):
+        elo, eloLow, eloHigh = eloStats(self.wins, self.draws, self.losses)
+        llr, lower, upper, decision = sprt(self.wins, self.draws, self.losses, *self.sprtBounds)
+        games = len(self.results)
+        return {
+            'engines': [engine['name'] for engine in self.engines],
+            'games': games,
+            'wins': self.wins,
+            'draws': self.draws,
+            'losses': self.losses,
+            'elo': elo,
+            'eloLow': eloLow,
+            'eloHigh': eloHigh,
+            'sprt': {'elo0': self.sprtBounds[0], 'elo1': self.sprtBounds[1], 'llr': llr, 'lower': lower, 'upper': upper, 'decision': decision},
+            'seconds': seconds,
+            'gamesPerSecond': games / seconds if seconds else 0.0,
+            'workers': self.workers,
+        }
+
+def formatReport(report):
+    nameA, nameB = report['engines']
+    sprtReport = report['sprt']
+    decision = {'H1': f"H1 accepted ({nameA} is stronger by {sprtReport['elo1']} Elo)", 'H0': f"H0 accepted (not better than {sprtReport['elo0']} Elo)", '': 'continue'}[sprtReport['decision']]
+    return '\n'.join([
+        f"{nameA} vs {nameB}: +{report['wins']} ={report['draws']} -{report['losses']} in {report['games']} games",
+        f"Elo {report['elo']:+.1f} [{report['eloLow']:+.1f}, {report['eloHigh']:+.1f}] (95%)",
+        f"SPRT [{sprtReport['elo0']}, {sprtReport['elo1']}]: LLR {sprtReport['llr']:.2f} [{sprtReport['lower']:.2f}, {sprtReport['upper']:.2f}] {decision}",
+        f"{report['seconds']:.1f}s, {report['gamesPerSecond']:.2f} games/s with {report['workers']} workers",
+    ])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play two engine configurations against each other and report the Elo difference.')
+    parser.add_argument('engineA', help="engine, e.g. 'new:depth=4' or 'fast:movetime=0.1' (options: depth, movetime, nodes, hash)")
+    parser.add_argument('engineB')
+    parser.add_argument('-o', '--openings', default=None, help='EPD or FEN file of start positions, a built-in set by default')
+    parser.add_argument('-r', '--rounds', type=int, default=1, help='times every opening is played with both colors')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='worker processes, defaults to the number of CPUs')
+    parser.add_argument('--pgn', default=None, help='append finished games to this PGN file')
+    parser.add_argument('--elo0', type=float, default=0.0)
+    parser.add_argument('--elo1', type=float, default=5.0)
+    parser.add_argument('--sprt-stop', action='store_true', help='stop as soon as the SPRT accepts a hypothesis')
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES, help='draw games that get longer than this')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    openings = [entry.fen for entry in readEpd(args.openings)] if args.openings else OPENINGS
+    tournament = Tournament(parseEngine(args.engineA), parseEngine(args.engineB), openings, args.rounds, args.workers, args.pgn, args.elo0, args.elo1, args.max_plies)
+
+    def info(result, tournament):
+        if not args.json:
+            print(f"game {len(tournament.results)}: {result['white']} - {result['black']} {result['result']} ({result['termination']}, {result['plies']} plies, {result['seconds']:.1f}s)")
+
+    report = tournament.run(info, args.sprt_stop)
+    print(json.dumps(report, indent=2) if args.json else formatReport(report))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+from array import array
+
+#bound types, 0 marks an empty slot
+EXACT, LOWER, UPPER = 1, 2, 3
+
+#scores are stored with this offset to keep them unsigned
+SCORE_OFFSET = 1 << 20
+#bytes per slot: one key and one packed data word
+SLOT_BYTES = 16
+
+class TranspositionTable:
+    """Fixed-size hash table of search results, two slots per bucket: the first keeps the deepest result, the second is always replaced."""
+
+    def __init__(self, sizeMB=16):
+        self.resize(sizeMB)
+
+    def resize(self, sizeMB):
+        #power of two bucket count, so the bucket is a bit mask of the key
+        buckets = 1
+        while 2 * buckets * 2 * SLOT_BYTES <= sizeMB * 1024 * 1024:
+            buckets *= 2
+
+        self.sizeMB = sizeMB
+        self.mask = buckets - 1
+        self.keys = array('Q', bytes(8 * 2 * buckets))
+        self.data = array('Q', bytes(8 * 2 * buckets))
+
+    def clear(self):
+        self.resize(self.sizeMB)
+
+    def probe(self, key):
+        """Returns (depth, bound, score, move code) stored for this key, or None."""
+        index = 2 * (key & self.mask)
+        for slot in (index, index + 1):
+            if self.keys[slot] == key and self.data[slot]:
+                data = self.data[slot]
+                return (data >> 16 & 255, data >> 24 & 3, (data >> 26) - SCORE_OFFSET, data & 0xFFFF)
+
+        return None
+
+    def store(self, key, depth, bound, score, move=0):
+        index = 2 * (key & self.mask)
+        data = move | min(max(depth, 0), 255) << 16 | bound << 24 | (score + SCORE_OFFSET) << 26
+
+        #keep the deeper result in the first slot, anything else goes to the second
+        if self.keys[index] == key or not self.data[index] or depth >= self.data[index] >> 16 & 255:
+            if self.keys[index] != key and self.data[index]:
+                self.keys[index + 1], self.data[index + 1] = self.keys[index], self.data[index]
+            slot = index
+        else:
+            slot = index + 1
+
+        self.keys[slot] = key
+        self.data[slot] = data
+
+    def hashfull(self):
+        """Used slots in permille, estimated from the first thousand."""
+        sample = min(1000, len(self.data))
+        return sum(1 for data in self.data[:sample] if data) * 1000 // sample
@@ -0,0 +1,236 @@
+import sys
+import threading
+from game import Game
+from movegen import findMove
+from search import Search, isMateScore, MATE_SCORE, MAX_PLY, DEFAULT_TABLE_MB
+from transposition import TranspositionTable
+from book import PolyglotBook
+
+ENGINE_NAME = 'Python Chess'
+ENGINE_AUTHOR = 'Python Chess authors'
+INITIAL_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+#moves to plan for when the clock has no moves to go, and time kept back for communication, in seconds
+DEFAULT_MOVES_TO_GO = 30
+MOVE_OVERHEAD = 0.05
+
+def scoreString(score):
+    """UCI score: centipawns, or mate in moves (negative if getting mated)."""
+    if isMateScore(score):
+        plies = MATE_SCORE - abs(score)
+        moves = (plies + 1) // 2
+        return f'mate {moves if score > 0 else -moves}'
+    return f'cp {score}'
+
+def clockMovetime(remaining, increment, movesToGo):
+    """Seconds to spend on a move with remaining and increment in milliseconds."""
+    remaining, increment = remaining / 1000, increment / 1000
+    movetime = remaining / (movesToGo or DEFAULT_MOVES_TO_GO) + 0.8 * increment
+    return max(0.0, min(movetime, remaining - MOVE_OVERHEAD))
+
+class UciEngine:
+    """Speaks the UCI protocol on text streams. Searches run in a thread, so stop and isready are answered while searching."""
+
+    def __init__(self, input=sys.stdin, output=sys.stdout):
+        self.input = input
+        self.output = output
+        self.outputLock = threading.Lock()
+
+        self.table = TranspositionTable(DEFAULT_TABLE_MB)
+        self.book = None
+        self.bitbases = None
+
+        self.game = Game(INITIAL_FEN, lazySan=True)
+        #the fen and moves of the last position command, later commands usually only add moves
+        self.positionFen = INITIAL_FEN
+        self.positionMoves = []
+
+        self.search = None
+        self.searchThread = None
+        #a pondering search becomes a normal one on ponderhit, with the time of its go command
+        self.pondering = False
+        self.ponderMovetime = None
+        self.ponderInfinite = False
+        #set by stop, an infinite search waits for it before sending its best move
+        self.stopEvent = threading.Event()
+
+    def send(self, line):
+        with self.outputLock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def run(self):
+        for line in self.input:
+            if not self.handle(line):
+                break
+        self.stop()
+
+    def handle(self, line):
+        """Handle one command line. Returns False on quit."""
+        tokens = line.split()
+        if not tokens:
+            return True
+
+        command, args = tokens[0], tokens[1:]
+        if command == 'uci':
+            self.send(f'id name {ENGINE_NAME}')
+            self.send(f'id author {ENGINE_AUTHOR}')
+            self.send(f'option name Hash type spin default {DEFAULT_TABLE_MB} min 1 max 4096')
+            self.send('option name BookFile type string default <empty>')
+            self.send('option name BitbaseDirectory type string default <empty>')
+            self.send('uciok')
+        elif command == 'isready':
+            self.send('readyok')
+        elif command == 'setoption':
+            self.setOption(args)
+        elif command == 'ucinewgame':
+            self.stop()
+            self.table.clear()
+        elif command == 'position':
+            self.stop()
+            self.setPosition(args)
+        elif command == 'go':
+            self.stop()
+            self.go(args)
+        elif command == 'ponderhit':
+            self.ponderhit()
+        elif command == 'stop':
+            self.stop()
+        elif command == 'quit':
+            return False
+
+        return True
+
+    def setOption(self, args):
+        text = ' '.join(args)
+        if not text.startswith('name '):
+            return
+        name, _, value = text[5:].partition(' value ')
+        name, value = name.strip().lower(), value.strip()
+
+        if name == 'hash' and value.isdigit():
+            self.stop()
+            self.table.resize(max(1, int(value)))
+        elif name == 'bookfile':
+            if self.book:
+                self.book.close()
+            self.book = PolyglotBook(value) if value and value != '<empty>' else None
+        elif name == 'bitbasedirectory':
+            self.bitbases = None
+            if value and value != '<empty>':
+                #bitbase loads NumPy, only pay for it when bitbases are used
+                from bitbase import Bitbases
+                self.bitbases = Bitbases(value)
+
+    def setPosition(self, args):
+        if 'moves' in args:
+            index = args.index('moves')
+            args, moves = args[:index], args[index + 1:]
+        else:
+            moves = []
+
+        if args and args[0] == 'fen':
+            fen = ' '.join(args[1:])
+        else:
+            fen = INITIAL_FEN
+
+        #only play the new moves if the position continues the last one
+        if fen != self.positionFen or moves[:len(self.positionMoves)] != self.positionMoves:
+            self.game = Game(fen, lazySan=True)
+            self.positionFen = fen
+            self.positionMoves = []
+
+        for uci in moves[len(self.positionMoves):]:
+            move = findMove(self.game.board, self.game.active, uci)
+            if not move:
+                self.send(f'info string illegal move {uci}')
+                break
+            self.game.turn(move)
+            self.positionMoves.append(uci)
+
+    def go(self, args):
+        limits = {}
+        flags = set()
+        for index, token in enumerate(args):
+            if token in ('infinite', 'ponder'):
+                flags.add(token)
+            elif index + 1 < len(args) and args[index + 1].lstrip('-').isdigit():
+                limits[token] = int(args[index + 1])
+
+        #depth 0 still searches one ply, so there is a move to send
+        depth = max(limits.get('depth', MAX_PLY), 1)
+        nodes = limits.get('nodes')
+        #time for the move, pondering and infinite searches only get it on ponderhit, if ever
+        limitTime = limits['movetime'] / 1000 if 'movetime' in limits else None
+        if limitTime is None:
+            limitTime = self.clockTime(limits)
+        movetime = None if flags else limitTime
+
+        if not limits.keys() & {'depth', 'nodes', 'movetime', 'wtime', 'btime'} and not flags:
+            flags.add('infinite')
+
+        if self.book and not flags:
+            move = self.book.weightedMove(self.game.board)
+            if move:
+                self.send(f'bestmove {move.uci()}')
+                return
+
+        def info(data):
+            nps = int(data['nodes'] / data['time']) if data['time'] else 0
+            self.send(f"info depth {data['depth']} score {scoreString(data['score'])} nodes {data['nodes']} nps {nps} time {int(1000 * data['time'])} pv {' '.join(data['pv'])}")
+
+        self.pondering = 'ponder' in flags
+        self.ponderMovetime = limitTime
+        self.ponderInfinite = 'infinite' in flags
+
+        self.stopEvent.clear()
+        self.search = Search(self.game.board, self.game.active, depth, movetime, nodes, info,
+                             history=self.game.keyHistory[:-1], table=self.table, bitbases=self.bitbases)
+        waitForStop = bool(flags)
+        self.searchThread = threading.Thread(target=self.runSearch, args=(self.search, waitForStop), daemon=True)
+        self.searchThread.start()
+
+    def runSearch(self, search, waitForStop):
+        result = search.run()
+        #a mated or stalemated root has no iteration to report, its score is still sent for adjudication
+        if not result.bestMove:
+            self.send(f'info depth 0 score {scoreString(result.score)}')
+        #an infinite search only reports its move when told to stop
+        if waitForStop:
+            self.stopEvent.wait()
+        self.send(f"bestmove {result.bestMove.uci() if result.bestMove else '0000'}")
+
+    def clockTime(self, limits):
+        """Seconds for the move from the clocks of go, or None. Without a clock for the side to move the other side's is used, so the search can't run forever."""
+        sides = ('w', 'b') if self.game.active == 'w' else ('b', 'w')
+        for col in sides:
+            if f'{col}time' in limits:
+                return clockMovetime(limits[f'{col}time'], limits.get(f'{col}inc', 0), limits.get('movestogo'))
+        return None
+
+    def ponderhit(self):
+        """The opponent played the expected move: keep searching, now under the time limit of the go command."""
+        if not self.searchThread or not self.pondering:
+            return
+        self.pondering = False
+        if self.ponderMovetime is not None:
+            self.search.startClock(self.ponderMovetime)
+        #the best move is sent as soon as the search ends
+        if not self.ponderInfinite:
+            self.stopEvent.set()
+
+    def stop(self):
+        """Stop a running search and wait for its best move to be sent."""
+        if self.searchThread:
+            self.search.stop()
+            self.stopEvent.set()
+            self.searchThread.join()
+            self.searchThread = None
+            self.search = None
+
+def main():
+    UciEngine().run()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,20 +3,23 @@ from PySide6.QtWidgets import *
 from PySide6.QtGui import *
 from PySide6.QtCore import *
 from game import Game
+from book import PolyglotBook
 from playGameLayout import PlayGameLayout
 
 class MainWindow(QWidget):
-    def __init__(self):
+    def __init__(self, bookPath=None):
         super().__init__()
         self.setWindowTitle('Python Chess')
-        self.game = Game()#'rnbqkbnr/2pp1ppp/pp6/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 0 4')
+        #an opening book can be given as the first argument
+        book = PolyglotBook(bookPath) if bookPath else None
+        self.game = Game(book=book)#'rnbqkbnr/2pp1ppp/pp6/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 0 4')
         layout = PlayGameLayout(self, self.game)
         self.setLayout(layout)
 
 
 if __name__ == '__main__':
     app = QApplication()
-    widget = MainWindow()
+    widget = MainWindow(sys.argv[1] if len(sys.argv) > 1 else None)
     widget.show()
 
     sys.exit(app.exec_())
\ No newline at end of file
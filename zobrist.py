@@ -0,0 +1,32 @@
+import random
+
+#fixed seed, so keys are stable across runs and processes
+_random = random.Random(0x5EED)
+
+def randomKey():
+    return _random.getrandbits(64)
+
+PIECE_KEYS = {char: tuple(randomKey() for sq in range(64)) for char in 'PNBRQKpnbrqk'}
+CASTLE_KEYS = {char: randomKey() for char in 'KQkq'}
+ENPASSANT_KEYS = tuple(randomKey() for j in range(8))
+SIDE_KEY = randomKey()
+
+def enpassantKey(pos):
+    """Key of the en passant square, 0 if there is none."""
+    return ENPASSANT_KEYS[pos.j] if pos.isOnBoard() else 0
+
+def positionKey(board):
+    """Compute the key of a board from scratch. Board keeps its zobristKey up to date incrementally, this is for setup and verification."""
+    key = 0
+    for pos, piece in board.pieces.items():
+        key ^= PIECE_KEYS[str(piece)][pos.sq]
+
+    for char, right in board.castleRight.items():
+        if right:
+            key ^= CASTLE_KEYS[char]
+
+    key ^= enpassantKey(board.enpassantPossible)
+    if board.active == 'b':
+        key ^= SIDE_KEY
+
+    return key